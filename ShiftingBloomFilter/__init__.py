@@ -7,22 +7,80 @@ Bloom filter, that supports multiple sets or multisets.
 
 Available objects:
 - ShiftingBloomFilter => Shifting Bloom Filter
+- ConcurrentShiftingBloomFilter => Shifting Bloom Filter safe to share
+                                   between threads
+- CountingShiftingBloomFilter => Shifting Bloom Filter supporting removal
+- ScalableShiftingBloomFilter => Shifting Bloom Filter growing with the data
+- WindowedShiftingBloomFilter => Shifting Bloom Filter forgetting items older
+                                 than a window of generations
+- ShardedShiftingBloomFilter => Shifting Bloom Filter split into shards that
+                                are saved and reloaded one by one
 
 Available constants:
 - MULTISET - mode of operation of ShiftingBloomFilter where the filter is used
            with multiset (a set that can have more than one of thesame element)
 - MULTIPLE - mode of operation of ShiftingBloomFilter where the filter is used
            with many different sets.
+- FAST_HASH - hash_source of ShiftingBloomFilter (or hash_family of
+            utils.HashFactory) selecting seeded xxh64 hash functions.
 
 Available submodules:
 - utils => utilities that can be used with ShiftingBloomFilter
+- bit_array => packed bit array used as storage of the filter
+- fast_hash => fast seeded non-cryptographic hash functions
+- file_format => versioned binary file format of the filter
+- instrumentation => opt-in counters of hashing, scans and set bits
+- parallel => parallel bulk building of the filter with worker processes
+- server => asyncio membership service coalescing requests into batches
 - visualiser => GUI tool for visualising the filter.
 - exceptions => all possible exceptions that can be thrown by objects in
                 this module
+
+Submodules other than exceptions and fast_hash, and the filters derived
+from ShiftingBloomFilter, are imported on first access, so importing the
+package only loads ShiftingBloomFilter. numpy is imported by the first
+batch operation that uses it.
 """
 
+import importlib
+
 from ShiftingBloomFilter.shifting_bloom_filter import ShiftingBloomFilter
 from ShiftingBloomFilter.shifting_bloom_filter import MULTISET, MULTIPLE
-import ShiftingBloomFilter.utils as utils
+from ShiftingBloomFilter.fast_hash import FAST_HASH
 import ShiftingBloomFilter.exceptions as exceptions
-__all__ = ["ShiftingBloomFilter", "utils", "exceptions", "MULTISET", "MULTIPLE"]
+import ShiftingBloomFilter.fast_hash as fast_hash
+__all__ = ["ShiftingBloomFilter", "ConcurrentShiftingBloomFilter",
+           "CountingShiftingBloomFilter", "ScalableShiftingBloomFilter",
+           "WindowedShiftingBloomFilter", "ShardedShiftingBloomFilter",
+           "utils", "exceptions", "fast_hash", "MULTISET", "MULTIPLE",
+           "FAST_HASH"]
+
+# submodules imported by __getattr__ when first used
+_LAZY_SUBMODULES = ("utils", "file_format", "parallel", "server", "visualiser")
+
+# filters imported by __getattr__ from their submodule when first used
+_LAZY_FILTERS = {
+    "ConcurrentShiftingBloomFilter": "concurrent_shifting_bloom_filter",
+    "CountingShiftingBloomFilter": "counting_shifting_bloom_filter",
+    "ScalableShiftingBloomFilter": "scalable_shifting_bloom_filter",
+    "WindowedShiftingBloomFilter": "windowed_shifting_bloom_filter",
+    "ShardedShiftingBloomFilter": "sharded_shifting_bloom_filter",
+}
+
+
+def __getattr__(name):
+    """imports lazy submodule or filter name on first access"""
+    if name in _LAZY_SUBMODULES:
+        module = importlib.import_module("." + name, __name__)
+        globals()[name] = module
+        return module
+    if name in _LAZY_FILTERS:
+        module = importlib.import_module("." + _LAZY_FILTERS[name], __name__)
+        globals()[name] = getattr(module, name)
+        return globals()[name]
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    """lists attributes of the package including lazy submodules"""
+    return sorted(set(globals()) | set(_LAZY_SUBMODULES) | set(_LAZY_FILTERS))
@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+Packed storage backends for ShiftingBloomFilter.
+    - BitArray => array of bits packed eight to a byte.
+    - CounterArray => array of small saturating counters packed into bytes.
+
+    ** NOTE: set_many and test_many use numpy when it is installed and fall
+             back to plain python loops otherwise. numpy is imported by the
+             first of them, not with the module. **
+"""
+
+# "The way to get started is to quit talking and begin doing."
+#           ~ Walt Disney
+
+# numpy module imported by _numpy, False until its first call
+_numpy_module = False
+
+# bytes combined at once by union_update when numpy is not installed
+CHUNK_BYTES = 1 << 20
+
+
+def _numpy():
+    """
+        (module or None) returns numpy, importing it on first use, None when
+        it is not installed.
+    """
+    global _numpy_module
+    if _numpy_module is False:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpy_module = numpy
+    return _numpy_module
+
+
+class BitArray:
+    """
+        Array of bits packed eight to a byte, bit i is stored in byte i // 8
+        under mask 1 << (i % 8), so consecutive bits form little-endian words.
+    """
+
+    def __init__(self, length):
+        """
+            BitArray(
+                length => number of bits in the array
+            )
+
+            Public methods:
+            - (class) from_buffer(length, buffer) => array over existing buffer
+            - set(index) => set bit at index, returns if it was newly set
+            - test(index) => returns if bit at index is set
+            - set_many(positions) => set bits at all positions
+            - test_many(positions) => returns which positions have bit set
+            - popcount() => returns number of set bits
+            - union_update(other) => bitwise or other array into this one
+            - intersection_update(other) => bitwise and other array into
+                                            this one
+            - get_window(index, width, start, span) => returns width bits
+                                                      from index as an int
+
+            ** supports: **
+            - indexing (returns 0 or 1) and item assignment
+            - built-in len and bool functions
+            - iterating over.
+        """
+        self.length = length
+        self.data = bytearray((length + 7) >> 3)
+
+    @classmethod
+    def from_buffer(cls, length, buffer):
+        """
+            (BitArray) returns array of length bits stored in buffer without
+                       copying it. Read-only buffers give read-only arrays.
+            from_buffer(
+                length => number of bits in the array
+                buffer => bytes like object of at least (length + 7) // 8
+                          bytes, for example a memoryview of an mmap
+            )
+        """
+        bits = cls.__new__(cls)
+        bits.length = length
+        bits.data = memoryview(buffer).cast("B")[:(length + 7) >> 3]
+        return bits
+
+    def __getstate__(self):
+        """returns state for pickling, external buffers are copied"""
+        state = self.__dict__.copy()
+        if not isinstance(self.data, bytearray):
+            state["data"] = bytearray(self.data)
+        return state
+
+    def __len__(self):
+        """(int) returns number of bits in the array"""
+        return self.length
+
+    def __bool__(self):
+        """(boolean) returns if any bit is set"""
+        return any(self.data)
+
+    def __eq__(self, other):
+        """(boolean) arrays are equal if they hold the same bits"""
+        if not isinstance(other, BitArray):
+            return NotImplemented
+        return self.length == other.length and self.data == other.data
+
+    def __repr__(self):
+        """return string representation of the array"""
+        return "BitArray(%s)" % self.length
+
+    def _index(self, index):
+        """(int) returns index normalised to the range of the array"""
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("BitArray index out of range")
+        return index
+
+    def __getitem__(self, index):
+        """(int) [index] => returns 1 if bit at index is set, 0 otherwise"""
+        index = self._index(index)
+        return (self.data[index >> 3] >> (index & 7)) & 1
+
+    def __setitem__(self, index, value):
+        """(void) [index] = value => sets or clears bit at index"""
+        index = self._index(index)
+        if value:
+            self.data[index >> 3] |= 1 << (index & 7)
+        else:
+            self.data[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+
+    def __iter__(self):
+        """Iterator over the bits of the array"""
+        length = self.length
+        for byte_no, byte in enumerate(self.data):
+            start = byte_no << 3
+            for bit in range(min(8, length - start)):
+                yield (byte >> bit) & 1
+
+    def set(self, index):
+        """
+            (boolean) sets bit at index, returns True if the bit was not
+                      set before.
+            set(
+                index => position of the bit, must be within the array
+            )
+        """
+        mask = 1 << (index & 7)
+        byte = self.data[index >> 3]
+        if byte & mask:
+            return False
+        self.data[index >> 3] = byte | mask
+        return True
+
+    def test(self, index):
+        """
+            (boolean) returns if bit at index is set
+            test(
+                index => position of the bit, must be within the array
+            )
+        """
+        return bool(self.data[index >> 3] & (1 << (index & 7)))
+
+    def set_many(self, positions):
+        """
+            (void) sets bits at every position in a single operation
+            set_many(
+                positions => numpy array (or iterable when numpy is not
+                             installed) of positions within the array
+            )
+        """
+        numpy = _numpy()
+        if numpy is None:
+            for index in positions:
+                self.set(index)
+            return
+        view = numpy.frombuffer(self.data, dtype=numpy.uint8)
+        masks = numpy.left_shift(1, positions & 7).astype(numpy.uint8)
+        numpy.bitwise_or.at(view, positions >> 3, masks)
+
+    def test_many(self, positions):
+        """
+            (numpy array of booleans) or ([boolean])
+            returns for every position if its bit is set, the result has the
+            same shape as positions.
+            test_many(
+                positions => numpy array (or iterable when numpy is not
+                             installed) of positions within the array
+            )
+        """
+        numpy = _numpy()
+        if numpy is None:
+            return [self.test(index) for index in positions]
+        view = numpy.frombuffer(self.data, dtype=numpy.uint8)
+        return (view[positions >> 3] >> (positions & 7)) & 1 == 1
+
+    def popcount(self):
+        """(int) returns number of set bits, counted CHUNK_BYTES at a time"""
+        data = self.data
+        return sum(
+            bin(int.from_bytes(data[start:start + CHUNK_BYTES],
+                               "little")).count("1")
+            for start in range(0, len(data), CHUNK_BYTES)
+        )
+
+    def union_update(self, other):
+        """
+            (void) sets every bit that is set in other, arrays are combined
+                   word-wise rather than bit by bit.
+            union_update(
+                other => BitArray of the same length
+            )
+        """
+        numpy = _numpy()
+        self._combine(other, numpy.bitwise_or if numpy is not None
+                      else int.__or__)
+
+    def intersection_update(self, other):
+        """
+            (void) clears every bit that is not set in other, arrays are
+                   combined word-wise rather than bit by bit.
+            intersection_update(
+                other => BitArray of the same length
+            )
+        """
+        numpy = _numpy()
+        self._combine(other, numpy.bitwise_and if numpy is not None
+                      else int.__and__)
+
+    def _combine(self, other, operation):
+        """
+            (void) replaces data with operation(data, other data), applied
+                   to the whole numpy view or to CHUNK_BYTES long ints.
+        """
+        if len(other) != self.length:
+            raise ValueError("BitArray lengths differ.")
+        numpy = _numpy()
+        if numpy is not None:
+            view = numpy.frombuffer(self.data, dtype=numpy.uint8)
+            operation(view, numpy.frombuffer(other.data, dtype=numpy.uint8),
+                      out=view)
+            return
+        data = self.data
+        for start in range(0, len(data), CHUNK_BYTES):
+            end = min(start + CHUNK_BYTES, len(data))
+            word = operation(int.from_bytes(data[start:end], "little"),
+                             int.from_bytes(other.data[start:end], "little"))
+            data[start:end] = word.to_bytes(end - start, "little")
+
+    def get_window(self, index, width, start=0, span=None):
+        """
+            (int) returns width consecutive bits from index as an int, bit
+                  j of the result is bit index + j. Bits past the end of
+                  the region of span bits from start wrap around to start.
+            get_window(
+                index => position of the first bit, within the region
+                width => number of bits to read
+                start => first bit of the region, by default 0
+                span => length of the region, by default up to the end
+                        of the array
+            )
+        """
+        if span is None:
+            span = self.length - start
+        window = 0
+        shift = 0
+        while width > 0:
+            bits = min(width, start + span - index)
+            first = index >> 3
+            word = int.from_bytes(self.data[first:(index + bits + 7) >> 3],
+                                  "little")
+            window |= ((word >> (index & 7)) & ((1 << bits) - 1)) << shift
+            shift += bits
+            width -= bits
+            index = start
+        return window
+
+
+class CounterArray:
+    """
+        Array of saturating counters of width bits packed into bytes, for
+        the default width of 4 two counters share a byte. A counter that
+        reached its maximum value is never changed again.
+    """
+
+    WIDTHS = (1, 2, 4, 8)
+
+    def __init__(self, length, width=4):
+        """
+            CounterArray(
+                length => number of counters in the array
+                width => bits per counter, one of 1, 2, 4 or 8
+            )
+
+            Public methods:
+            - (class) from_buffer(length, buffer, width) => array over
+                                                            existing buffer
+            - set(index) => increment counter, returns if it became non-zero
+            - remove(index) => decrement counter, returns if it became zero
+            - test(index) => returns if counter at index is non-zero
+            - set_many(positions) => increment counters at all positions
+            - test_many(positions) => returns which counters are non-zero
+            - popcount() => returns number of non-zero counters
+            - union_update(other) => add counters of other array
+            - intersection_update(other) => keep lower of the counters
+
+            ** supports: **
+            - indexing (returns counter value) and item assignment
+            - built-in len and bool functions
+            - iterating over.
+        """
+        if width not in CounterArray.WIDTHS:
+            raise ValueError("Counter width has to be one of %s." % (
+                CounterArray.WIDTHS,))
+        self.length = length
+        self.width = width
+        self.data = bytearray(CounterArray.size(length, width))
+
+    @staticmethod
+    def size(length, width):
+        """(int) returns number of bytes needed by length counters"""
+        per_byte = 8 // width
+        return (length + per_byte - 1) // per_byte
+
+    @classmethod
+    def from_buffer(cls, length, buffer, width=4):
+        """
+            (CounterArray) returns array of length counters stored in buffer
+                           without copying it.
+        """
+        counters = cls.__new__(cls)
+        counters.length = length
+        counters.width = width
+        counters.data = memoryview(buffer).cast("B")[
+            :CounterArray.size(length, width)
+        ]
+        return counters
+
+    __getstate__ = BitArray.__getstate__
+    _index = BitArray._index
+
+    @property
+    def max_value(self):
+        """(int) value at which counters saturate"""
+        return (1 << self.width) - 1
+
+    def __len__(self):
+        """(int) returns number of counters in the array"""
+        return self.length
+
+    def __bool__(self):
+        """(boolean) returns if any counter is non-zero"""
+        return any(self.data)
+
+    def __eq__(self, other):
+        """(boolean) arrays are equal if they hold the same counters"""
+        if not isinstance(other, CounterArray):
+            return NotImplemented
+        return (self.length == other.length and self.width == other.width
+                and self.data == other.data)
+
+    def __repr__(self):
+        """return string representation of the array"""
+        return "CounterArray(%s, %s)" % (self.length, self.width)
+
+    def _locate(self, index):
+        """((int, int)) returns byte and bit shift of counter at index"""
+        per_byte = 8 // self.width
+        return index // per_byte, (index % per_byte) * self.width
+
+    def __getitem__(self, index):
+        """(int) [index] => returns value of counter at index"""
+        index = self._index(index)
+        byte, shift = self._locate(index)
+        return (self.data[byte] >> shift) & self.max_value
+
+    def __setitem__(self, index, value):
+        """(void) [index] = value => sets counter, clamped to max_value"""
+        index = self._index(index)
+        byte, shift = self._locate(index)
+        value = max(0, min(value, self.max_value))
+        self.data[byte] = ((self.data[byte] & ~(self.max_value << shift))
+                           | (value << shift)) & 0xFF
+
+    def __iter__(self):
+        """Iterator over the counters of the array"""
+        for index in range(self.length):
+            yield self[index]
+
+    def set(self, index):
+        """
+            (boolean) increments counter at index unless it is saturated,
+                      returns True if the counter was zero before.
+        """
+        byte, shift = self._locate(index)
+        value = (self.data[byte] >> shift) & self.max_value
+        if value < self.max_value:
+            self.data[byte] += 1 << shift
+        return value == 0
+
+    def remove(self, index):
+        """
+            (boolean) decrements counter at index unless it is zero or
+                      saturated, returns True if the counter became zero.
+        """
+        byte, shift = self._locate(index)
+        value = (self.data[byte] >> shift) & self.max_value
+        if 0 < value < self.max_value:
+            self.data[byte] -= 1 << shift
+            return value == 1
+        return False
+
+    def test(self, index):
+        """(boolean) returns if counter at index is non-zero"""
+        byte, shift = self._locate(index)
+        return bool((self.data[byte] >> shift) & self.max_value)
+
+    def set_many(self, positions):
+        """(void) increments counter at every position, once per occurrence"""
+        for index in (positions.tolist() if _numpy() is not None
+                      else positions):
+            self.set(index)
+
+    def test_many(self, positions):
+        """
+            (numpy array of booleans) or ([boolean])
+            returns for every position if its counter is non-zero, the result
+            has the same shape as positions.
+        """
+        numpy = _numpy()
+        if numpy is None:
+            return [self.test(index) for index in positions]
+        per_byte = 8 // self.width
+        view = numpy.frombuffer(self.data, dtype=numpy.uint8)
+        shifts = (positions % per_byte) * self.width
+        return (view[positions // per_byte] >> shifts) & self.max_value != 0
+
+    def popcount(self):
+        """(int) returns number of non-zero counters"""
+        per_byte = 8 // self.width
+        nonzero = [
+            sum(1 for slot in range(per_byte)
+                if (byte >> (slot * self.width)) & self.max_value)
+            for byte in range(256)
+        ]
+        return sum(map(nonzero.__getitem__, self.data))
+
+    def union_update(self, other):
+        """(void) adds counters of other array, saturating at max_value"""
+        numpy = _numpy()
+        self._combine(other, numpy.add if numpy is not None
+                      else int.__add__)
+
+    def intersection_update(self, other):
+        """(void) keeps the lower of both counters at every position"""
+        numpy = _numpy()
+        self._combine(other, numpy.minimum if numpy is not None else min)
+
+    def _combine(self, other, operation):
+        """
+            (void) replaces every counter with operation(counter, other's),
+                   clamped to max_value. With numpy counters are unpacked,
+                   combined and repacked CHUNK_BYTES at a time, otherwise
+                   they are combined one by one.
+        """
+        if len(other) != self.length or other.width != self.width:
+            raise ValueError("CounterArray lengths or widths differ.")
+        numpy = _numpy()
+        if numpy is None:
+            for index in range(self.length):
+                self[index] = operation(self[index], other[index])
+            return
+        view = numpy.frombuffer(self.data, dtype=numpy.uint8)
+        other_view = numpy.frombuffer(other.data, dtype=numpy.uint8)
+        shifts = numpy.arange(0, 8, self.width, dtype=numpy.uint16)
+
+        def unpack(chunk):
+            return ((chunk[:, None].astype(numpy.uint16) >> shifts)
+                    & self.max_value)
+
+        for start in range(0, len(view), CHUNK_BYTES):
+            end = start + CHUNK_BYTES
+            counters = numpy.minimum(
+                operation(unpack(view[start:end]),
+                          unpack(other_view[start:end])),
+                self.max_value
+            )
+            view[start:end] = (counters << shifts).sum(axis=1)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Thread-safe shifting bloom filter.
+    - ConcurrentShiftingBloomFilter => ShiftingBloomFilter safe to share
+                                       between threads, also without the GIL.
+"""
+
+# "Alone we can do so little; together we can do so much."
+#           ~ Helen Keller
+
+from contextlib import ExitStack
+import threading
+from .shifting_bloom_filter import ShiftingBloomFilter, encode_key
+from .bit_array import _numpy
+
+# bits guarded by one stripe lock are 2 ** REGION_SHIFT bits long regions,
+# so bits sharing a byte are always guarded by the same lock
+REGION_SHIFT = 12
+
+
+class ConcurrentShiftingBloomFilter(ShiftingBloomFilter):
+    """
+        ConcurrentShiftingBloomFilter => ShiftingBloomFilter that can be shared
+                                         between threads.
+
+        Writers lock only the regions of the bit array they modify, regions
+        are mapped onto a fixed number of striped locks. Updates of count
+        and max_set are atomic and MULTISET inserts of the same item are
+        serialised, so concurrent inserts never lose a multiplicity.
+        Bits only ever change from 0 to 1, so readers do not lock.
+    """
+
+    def __init__(self, *args, stripes=64, **kwargs):
+        """
+        ConcurrentShiftingBloomFilter(
+            stripes => number of locks guarding the bit array and the
+                       number of locks serialising MULTISET inserts.
+            ...all other arguments as in ShiftingBloomFilter
+        )
+        """
+        super().__init__(*args, **kwargs)
+        self.stripes = stripes
+        self._init_locks()
+
+    def _init_locks(self):
+        """(void) creates stripe locks, key locks and lock for counters"""
+        self._locks = [threading.Lock() for _ in range(self.stripes)]
+        self._key_locks = [threading.Lock() for _ in range(self.stripes)]
+        self._meta_lock = threading.Lock()
+
+    def __getstate__(self):
+        """returns state for pickling, locks are not pickled"""
+        state = super().__getstate__()
+        for name in ("_locks", "_key_locks", "_meta_lock"):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        """restores pickled filter with fresh locks"""
+        super().__setstate__(state)
+        self.__dict__.setdefault("stripes", 64)
+        self._init_locks()
+
+    def __repr__(self):
+        """return string representation of an object constructor"""
+        return "Concurrent%s" % super().__repr__()
+
+    def _all_locks(self):
+        """(ExitStack) holds every stripe lock and the counter lock"""
+        stack = ExitStack()
+        for lock in self._locks:
+            stack.enter_context(lock)
+        stack.enter_context(self._meta_lock)
+        return stack
+
+    def merge(self, other):
+        """(void) adds all items of other filter, holding all locks"""
+        with self._all_locks():
+            super().merge(other)
+
+    def intersect(self, other):
+        """(void) keeps only items also in other filter, holding all locks"""
+        with self._all_locks():
+            super().intersect(other)
+
+    def insert(self, item, set_no=0):
+        """
+            (void) inserts item to bloom filter
+            insert(
+                item => item to insert
+                set_no => which set is the item supposed to go in, by default 0
+                          if working with multiple sets.
+            )
+        """
+        if self._stats is not None:
+            self._stats.operation("inserts")
+        if self.mode:
+            self._insert_at_offset(item, set_no)
+        elif not self._insert_multiset(item):
+            return
+        with self._meta_lock:
+            self.count += 1
+
+    def _insert_multiset(self, item):
+        """
+            (boolean) inserts another copy of item to multiset, holding the
+                      lock of the item so its multiplicity can not change
+                      between reading and setting the offset. Keys with
+                      the same bytes share the lock, the key is encoded
+                      once for the lock and the insert.
+        """
+        data = encode_key(item)
+        key = data if isinstance(data, bytes) else bytes(data)
+        with self._key_locks[hash(key) % self.stripes]:
+            return super()._insert_multiset(item, data)
+
+    def _set_positions(self, base, values, offset):
+        """
+            (void) sets base positions and offset positions shifted by offset,
+                   every bit is set under the lock of its region.
+        """
+        if offset > self.max_set:
+            with self._meta_lock:
+                self.max_set = max(self.max_set, offset)
+        bits = self.filter
+        locks = self._locks
+        stripes = self.stripes
+        shift = self._shift
+        newly = 0
+        for position in base + [shift(value, offset) for value in values]:
+            with locks[(position >> REGION_SHIFT) % stripes]:
+                newly += bits.set(position)
+        with self._meta_lock:
+            self._count_bits(newly)
+        if self._stats is not None:
+            self._stats.bits(newly, len(base) + len(values))
+
+    def insert_many(self, items, set_nos=0):
+        """
+            (void) inserts every item to bloom filter, a vectorised batch
+                   holds all locks while its bits are set.
+            insert_many(
+                items => iterable of items to insert
+                set_nos => set id for all items or an iterable with set id
+                           for every item, by default 0. Ignored for
+                           multisets.
+            )
+        """
+        if _numpy() is None or not self.mode:
+            super().insert_many(items, set_nos)
+            return
+        with self._all_locks():
+            super().insert_many(items, set_nos)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Counting shifting bloom filter, supporting removal of items.
+    - CountingShiftingBloomFilter => ShiftingBloomFilter storing small
+                                     counters instead of bits.
+"""
+
+# "Not everything that counts can be counted."
+#           ~ William Bruce Cameron
+
+from .shifting_bloom_filter import ShiftingBloomFilter, encode_key
+from .bit_array import CounterArray
+from .exceptions import IncompatibleFiltersError, ERROR_MSGS
+
+
+class CountingShiftingBloomFilter(ShiftingBloomFilter):
+    """
+        CountingShiftingBloomFilter => ShiftingBloomFilter with removal
+
+        Every position holds a saturating counter (4 bits by default, two
+        per byte) which is incremented on insert and decremented on remove.
+        Hashing and offsets are the same as in ShiftingBloomFilter.
+        Saturated counters are never decremented, so removal can not cause
+        false negatives.
+    """
+
+    def __init__(self, *args, counter_width=4, **kwargs):
+        """
+        CountingShiftingBloomFilter(
+            counter_width => bits per counter, one of 1, 2, 4 or 8
+            ...all other arguments as in ShiftingBloomFilter
+        )
+
+        public methods (in addition to those of ShiftingBloomFilter):
+        - remove(item, set_no) => remove item from set_no or, for
+                                  multisets, remove one copy of item
+        """
+        self.counter_width = counter_width
+        super().__init__(*args, **kwargs)
+
+    def _new_storage(self):
+        """(CounterArray) returns empty counters of the filter"""
+        return CounterArray(self.m, self.counter_width)
+
+    def __repr__(self):
+        """return string representation of an object constructor"""
+        return "Counting%s" % super().__repr__()
+
+    def _check_compatible(self, other):
+        """
+            (void) raises IncompatibleFiltersError unless other is counting
+                   filter with the same parameters and counter width.
+        """
+        super()._check_compatible(other)
+        if self.filter.width != other.filter.width:
+            raise IncompatibleFiltersError(ERROR_MSGS.INCOMPATIBLE_FILTERS)
+
+    def remove(self, item, set_no=0):
+        """
+            (boolean) removes item from set set_no (MULTIPLE) or removes one
+                      copy of item (MULTISET) by decrementing the counters
+                      its insert incremented. Returns False, leaving the
+                      filter untouched, if the item is not in the filter.
+            remove(
+                item => item to remove
+                set_no => set the item is removed from, by default 0.
+                          Ignored for multisets.
+            )
+        """
+        data = encode_key(item)
+        block = self._block_of(data)
+        base = self._hash_values(data, self._base_digesters, block)
+        values = self._hash_values(data, self._offset_digesters, block)
+        counters = self.filter
+        if not all(counters.test(value) for value in base):
+            return False
+        if self.mode:
+            if not all(counters.test(self._shift(value, set_no))
+                       for value in values):
+                return False
+            offset = set_no
+        else:
+            count = len(self._matching_offsets(values, self.max_count))
+            if not count:
+                return False
+            offset = count if count > 1 else 0
+        cleared = 0
+        for value in base:
+            cleared += counters.remove(value)
+        for value in values:
+            cleared += counters.remove(self._shift(value, offset))
+        self._count_bits(-cleared)
+        self.count -= 1
+        return True
@@ -5,6 +5,10 @@ Module containing ShiftingBloomFilter specific exceptions
     - SBFException => ShifingBloomFilter base top-level module exception.
     - HashesUnavailableError => Exception raised when there is problem with
                                 hash function avaialbilty.
+    - FileFormatError => Exception raised when a filter can not be written to
+                         or read from the binary file format.
+    - IncompatibleFiltersError => Exception raised when filters with different
+                                  parameters are combined.
 
     Other objects:
     - ERROR_MSGS => Wrapper around all the possible error messages.
@@ -22,6 +26,17 @@ class ERROR_MSGS:
     NOT_ENNOUGH_HASHES = ("The value given for hash_count exceeds "
                           "amount of available hash functions.")
     HASH_FUNCTION_UNAVAILABLE = "Given hash funtion is unavailable."
+    NOT_A_FILTER_FILE = "File is not a ShiftingBloomFilter binary file."
+    UNSUPPORTED_VERSION = "Unsupported ShiftingBloomFilter file version."
+    TRUNCATED_FILE = "ShiftingBloomFilter file is truncated."
+    INVALID_HEADER = ("ShiftingBloomFilter file header describes an "
+                      "invalid filter.")
+    NOT_A_MANIFEST = ("Directory has no valid ShardedShiftingBloomFilter "
+                      "manifest.")
+    HASH_NOT_SERIALISABLE = ("Hash function can not be described in the "
+                             "binary file format.")
+    INCOMPATIBLE_FILTERS = ("Filters differ in length, hash functions or "
+                            "mode and can not be combined.")
 
 
 class SBFException(Exception):
@@ -40,3 +55,27 @@ class HashesUnavailableError(SBFException, ValueError):
 
     def __str__(self):
         return self.message
+
+
+class FileFormatError(SBFException, ValueError):
+    """
+        Exception raised when there is error related to the binary file format
+    """
+    def __init__(self, message, *args, **kwargs):
+        super().__init__(args, kwargs)
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+class IncompatibleFiltersError(SBFException, ValueError):
+    """
+        Exception raised when filters that can not be combined are combined
+    """
+    def __init__(self, message, *args, **kwargs):
+        super().__init__(args, kwargs)
+        self.message = message
+
+    def __str__(self):
+        return self.message
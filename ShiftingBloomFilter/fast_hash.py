@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Fast seeded non-cryptographic hashing for ShiftingBloomFilter.
+    - xxh64 => 64 bit XXH64 digest of data as an int
+    - FastHashFunction => seeded XXH64 hash function
+    - FastHashFamily => any number of independent seeded hash functions,
+                        can be used as hash_source of ShiftingBloomFilter.
+
+    Other objects:
+    - FAST_HASH => name of the fast hash family, can be given as
+                   hash_source to ShiftingBloomFilter or as hash_family
+                   to utils.HashFactory.
+    - CAPACITY_HASH_SOURCE => default hash_source of for_capacity,
+                              FAST_HASH when xxhash is installed,
+                              otherwise salted "sha256".
+
+    ** NOTE: when the xxhash package is installed its C implementation is
+             used, otherwise digests are computed in pure python. Both
+             produce identical digests. **
+"""
+
+# "Speed is irrelevant if you are going in the wrong direction."
+#           ~ Mahatma Gandhi
+
+from struct import Struct
+
+FAST_HASH = "xxh64"
+
+_P1 = 11400714785074694791
+_P2 = 14029467366897019727
+_P3 = 1609587929392839161
+_P4 = 9650029242287828579
+_P5 = 2870177450012600261
+_MASK = 0xFFFFFFFFFFFFFFFF
+_STRIPE = Struct("<4Q")
+_LANE = Struct("<Q")
+_HALF_LANE = Struct("<I")
+
+
+def _round(acc, lane):
+    """(int) XXH64 round of accumulator acc with an input lane"""
+    acc = (acc + lane * _P2) & _MASK
+    acc = ((acc << 31) | (acc >> 33)) & _MASK
+    return (acc * _P1) & _MASK
+
+
+def _merge_round(acc, value):
+    """(int) XXH64 merge of accumulator value into acc"""
+    acc ^= _round(0, value)
+    return (acc * _P1 + _P4) & _MASK
+
+
+def _rotl(value, bits):
+    """(int) rotates 64 bit value left by bits"""
+    return ((value << bits) | (value >> (64 - bits))) & _MASK
+
+
+def _py_xxh64(data, seed=0):
+    """
+        (int) pure python XXH64 digest of data
+        _py_xxh64(
+            data => bytes like object to be hashed
+            seed => seed of the hash function
+        )
+    """
+    length = len(data)
+    seed &= _MASK
+    i = 0
+    if length >= 32:
+        v1 = (seed + _P1 + _P2) & _MASK
+        v2 = (seed + _P2) & _MASK
+        v3 = seed
+        v4 = (seed - _P1) & _MASK
+        unpack = _STRIPE.unpack_from
+        while i <= length - 32:
+            lane1, lane2, lane3, lane4 = unpack(data, i)
+            v1 = _round(v1, lane1)
+            v2 = _round(v2, lane2)
+            v3 = _round(v3, lane3)
+            v4 = _round(v4, lane4)
+            i += 32
+        acc = (_rotl(v1, 1) + _rotl(v2, 7)
+               + _rotl(v3, 12) + _rotl(v4, 18)) & _MASK
+        for value in (v1, v2, v3, v4):
+            acc = _merge_round(acc, value)
+    else:
+        acc = (seed + _P5) & _MASK
+    acc = (acc + length) & _MASK
+    while i + 8 <= length:
+        acc ^= _round(0, _LANE.unpack_from(data, i)[0])
+        acc = (_rotl(acc, 27) * _P1 + _P4) & _MASK
+        i += 8
+    if i + 4 <= length:
+        acc ^= (_HALF_LANE.unpack_from(data, i)[0] * _P1) & _MASK
+        acc = (_rotl(acc, 23) * _P2 + _P3) & _MASK
+        i += 4
+    while i < length:
+        acc ^= (data[i] * _P5) & _MASK
+        acc = (_rotl(acc, 11) * _P1) & _MASK
+        i += 1
+    acc ^= acc >> 33
+    acc = (acc * _P2) & _MASK
+    acc ^= acc >> 29
+    acc = (acc * _P3) & _MASK
+    return acc ^ (acc >> 32)
+
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# pure python xxh64 is slower than hashlib, so sized filters only default
+# to FAST_HASH when the C implementation is there
+CAPACITY_HASH_SOURCE = FAST_HASH if xxhash is not None else "sha256"
+
+if xxhash is None:
+    xxh64 = _py_xxh64
+elif hasattr(xxhash, "xxh64_intdigest"):
+    xxh64 = xxhash.xxh64_intdigest
+else:
+    def xxh64(data, seed=0):
+        """(int) XXH64 digest of data computed by xxhash"""
+        return xxhash.xxh64(data, seed).intdigest()
+
+
+class FastDigest:
+    """
+        Result of FastHashFunction, mimics the digest interface of hashlib.
+    """
+
+    def __init__(self, value):
+        """
+            FastDigest(
+                value => integer value of the digest
+            )
+        """
+        self.value = value
+
+    def digest(self):
+        """(bytes) returns canonical (big endian) digest"""
+        return self.value.to_bytes(8, "big")
+
+    def hexdigest(self):
+        """(str) returns digest as hexadecimal string"""
+        return "%016x" % self.value
+
+
+class FastHashFunction:
+    """
+        Seeded XXH64 hash function.
+    """
+
+    def __init__(self, seed=0):
+        """
+            FastHashFunction(
+                seed => seed of the hash function
+            )
+
+            Public methods:
+            - intdigest(data) => returns digest of data as an int
+
+            ** supports: **
+            - calling, returns an object with digest method like hashlib
+        """
+        self.seed = seed & _MASK
+
+    def __repr__(self):
+        """return string representation of a seeded hash function"""
+        return "FastHashFunction(%s)" % self.seed
+
+    def __eq__(self, other):
+        """(boolean) hash functions are equal if they share the seed"""
+        if not isinstance(other, FastHashFunction):
+            return NotImplemented
+        return self.seed == other.seed
+
+    def __hash__(self):
+        """(int) hash of the seeded function"""
+        return hash((FastHashFunction, self.seed))
+
+    def intdigest(self, data):
+        """(int) returns digest of data as an int"""
+        return xxh64(data, self.seed)
+
+    def __call__(self, data):
+        """Return digest object for data"""
+        return FastDigest(xxh64(data, self.seed))
+
+
+class FastHashFamily:
+    """
+        Sequence of independent seeded hash functions. Seeds of the
+        functions are derived from the seed of the family.
+    """
+
+    def __init__(self, hash_count, seed=0):
+        """
+            FastHashFamily(
+                hash_count => number of hash functions in the family
+                seed => seed of the family, families with the same seed
+                        produce the same hash functions
+            )
+
+            ** supports: **
+            - slicing
+            - built-in len function
+            - iterating over.
+        """
+        self.hash_count = hash_count
+        self.seed = seed
+        self.hash_funcs = [
+            FastHashFunction(xxh64(i.to_bytes(8, "little"), seed))
+            for i in range(hash_count)
+        ]
+
+    def __repr__(self):
+        """returns an representation of FastHashFamily object"""
+        return "FastHashFamily(%s, %s)" % (self.hash_count, self.seed)
+
+    def __eq__(self, other):
+        """(boolean) families are equal if they hold the same functions"""
+        if not isinstance(other, FastHashFamily):
+            return NotImplemented
+        return self.hash_funcs == other.hash_funcs
+
+    def __len__(self):
+        """Number of hash functions in the family"""
+        return len(self.hash_funcs)
+
+    def __iter__(self):
+        """Iterator for hash function list"""
+        return iter(self.hash_funcs)
+
+    def __getitem__(self, val):
+        """Slicing support for the function list"""
+        return self.hash_funcs[val]
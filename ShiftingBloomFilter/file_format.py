@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Versioned binary file format for ShiftingBloomFilter.
+
+Layout of the file (all integers little endian):
+    - fixed header => magic, version, flags (mode, length_as_power,
+                      counter width of counting filters),
+                      max_count (0 if not capped), m, k, max_set, count,
+                      length of the hash spec and block_bits (0 if not
+                      blocked)
+    - hash spec => JSON list describing every hash function, padded with
+                   zeros to a multiple of 8 bytes. Salted functions store
+                   their salt and "prefix": true when salted as a prefix
+    - bits => raw packed bit array, (m + 7) // 8 bytes, or packed counters
+              of counting filters
+
+No code is executed while loading and header fields are checked as the
+constructor would check them (max_set is at most m), so files from
+untrusted sources can be opened safely.
+
+    Functions:
+    - write_filter(bloom, filename) => write filter to file
+    - read_filter(cls, filename) => read filter from file into memory
+    - open_filter(cls, filename, readonly) => memory map filter from file
+    - hash_spec(hash_fn) => describe a hash function as a dict
+    - hash_from_spec(spec) => rebuild hash function from its description
+"""
+
+# "Simplicity is prerequisite for reliability."
+#           ~ Edsger W. Dijkstra
+
+import hashlib
+from hashlib import algorithms_guaranteed
+import json
+import mmap
+import os
+from struct import Struct
+from .bit_array import BitArray, CounterArray
+from .exceptions import FileFormatError, ERROR_MSGS
+from .fast_hash import FastHashFunction
+from .utils import HashFunction, PrefixHashFunction
+
+MAGIC = b"SBF\x00"
+VERSION = 1
+HEADER = Struct("<4sHHIQQQQII")
+
+_MODE_FLAG = 1
+_POWER_FLAG = 2
+_WIDTH_SHIFT = 2
+
+_HASHLIB_NAMES = {getattr(hashlib, name): name
+                  for name in algorithms_guaranteed}
+
+
+def hash_spec(hash_fn):
+    """
+        (dict) returns JSON serialisable description of a hash function
+        hash_spec(
+            hash_fn => hashlib constructor, utils.HashFunction (or
+                       utils.PrefixHashFunction) or
+                       fast_hash.FastHashFunction
+        )
+    """
+    if isinstance(hash_fn, FastHashFunction):
+        return {"xxh64": hash_fn.seed}
+    if isinstance(hash_fn, HashFunction):
+        name = _HASHLIB_NAMES.get(hash_fn.hash_base)
+        if name is not None:
+            spec = {"hashlib": name, "salt": hash_fn.salt.hex()}
+            if isinstance(hash_fn, PrefixHashFunction):
+                spec["prefix"] = True
+            return spec
+    else:
+        try:
+            name = _HASHLIB_NAMES.get(hash_fn)
+        except TypeError:
+            name = None
+        if name is not None:
+            return {"hashlib": name}
+    raise FileFormatError(ERROR_MSGS.HASH_NOT_SERIALISABLE)
+
+
+def hash_from_spec(spec):
+    """
+        (hash function) rebuilds hash function described by hash_spec
+        hash_from_spec(
+            spec => description returned by hash_spec
+        )
+    """
+    if "xxh64" in spec:
+        return FastHashFunction(int(spec["xxh64"]))
+    name = spec.get("hashlib")
+    if name not in algorithms_guaranteed:
+        raise FileFormatError(ERROR_MSGS.HASH_NOT_SERIALISABLE)
+    if "salt" in spec:
+        function = PrefixHashFunction if spec.get("prefix") else HashFunction
+        return function(getattr(hashlib, name), bytes.fromhex(spec["salt"]))
+    return getattr(hashlib, name)
+
+
+def _pad(size):
+    """(int) returns size rounded up to a multiple of 8"""
+    return (size + 7) & ~7
+
+
+def pack_header(bloom, spec_length):
+    """(bytes) returns fixed header describing bloom"""
+    flags = ((_MODE_FLAG if bloom.mode else 0)
+             | (_POWER_FLAG if bloom.length_as_power else 0)
+             | (getattr(bloom.filter, "width", 0) << _WIDTH_SHIFT))
+    return HEADER.pack(MAGIC, VERSION, flags, bloom.max_count or 0, bloom.m,
+                       bloom.k, bloom.max_set, bloom.count, spec_length,
+                       bloom.block_bits or 0)
+
+
+def write_filter(bloom, filename):
+    """
+        (void) writes filter to a binary file
+        write_filter(
+            bloom => filter to write
+            filename => name of the file
+        )
+    """
+    spec = json.dumps([hash_spec(fn) for fn in bloom.hashfunc]).encode()
+    spec += bytes(_pad(len(spec)) - len(spec))
+    header = pack_header(bloom, len(spec))
+    _check_header(HEADER.unpack(header))
+    with open(filename, "wb") as datafile:
+        datafile.write(header)
+        datafile.write(spec)
+        datafile.write(bloom.filter.data)
+
+
+def _read_header(datafile):
+    """
+        ((header fields), list of hash functions, offset of bits)
+        reads and validates header and hash spec from an open file, files
+        shorter than the spec and bits the header declares are rejected
+        before anything is allocated for them.
+    """
+    raw = datafile.read(HEADER.size)
+    if len(raw) < HEADER.size or raw[:len(MAGIC)] != MAGIC:
+        raise FileFormatError(ERROR_MSGS.NOT_A_FILTER_FILE)
+    header = HEADER.unpack(raw)
+    if header[1] != VERSION:
+        raise FileFormatError(ERROR_MSGS.UNSUPPORTED_VERSION)
+    _check_header(header)
+    offset = HEADER.size + header[8]
+    size = os.fstat(datafile.fileno()).st_size
+    if size < offset + _storage_size(header):
+        raise FileFormatError(ERROR_MSGS.TRUNCATED_FILE)
+    spec = datafile.read(header[8])
+    try:
+        hashes = [hash_from_spec(entry)
+                  for entry in json.loads(spec.rstrip(b"\x00").decode())]
+    except (ValueError, TypeError, AttributeError):
+        raise FileFormatError(ERROR_MSGS.NOT_A_FILTER_FILE)
+    if len(hashes) != header[5]:
+        raise FileFormatError(ERROR_MSGS.NOT_A_FILTER_FILE)
+    return header, hashes, offset
+
+
+def _check_header(header):
+    """
+        (void) raises FileFormatError unless header fields describe a filter
+               the constructor could have created
+    """
+    _, _, flags, _, m, _, max_set, _, _, block_bits = header
+    width = flags >> _WIDTH_SHIFT
+    if (m <= 0 or max_set > m
+            or (width and width not in CounterArray.WIDTHS)
+            or (block_bits and m % block_bits)
+            or (flags & _POWER_FLAG and m & (m - 1))):
+        raise FileFormatError(ERROR_MSGS.INVALID_HEADER)
+
+
+def _storage(header, buffer=None):
+    """
+        (BitArray or CounterArray) returns storage described by header,
+        over buffer if given, otherwise empty.
+    """
+    length, width = header[4], header[2] >> _WIDTH_SHIFT
+    if width:
+        if buffer is None:
+            return CounterArray(length, width)
+        return CounterArray.from_buffer(length, buffer, width)
+    if buffer is None:
+        return BitArray(length)
+    return BitArray.from_buffer(length, buffer)
+
+
+def _storage_size(header):
+    """(int) returns number of bytes of storage described by header"""
+    width = header[2] >> _WIDTH_SHIFT
+    if width:
+        return CounterArray.size(header[4], width)
+    return (header[4] + 7) // 8
+
+
+def _restore(cls, header, hashes, bits):
+    """(cls) returns filter restored from header fields and bit array"""
+    _, _, flags, max_count, m, k, max_set, count, _, block_bits = header
+    bloom = cls.__new__(cls)
+    state = {
+        "m": m,
+        "hashfunc": hashes,
+        "k": k,
+        "cut_off": k // 2,
+        "filter": bits,
+        "max_set": max_set,
+        "length_as_power": bool(flags & _POWER_FLAG),
+        "hash_source": hashes,
+        "mode": bool(flags & _MODE_FLAG),
+        "count": count,
+        "max_count": max_count or None,
+        "block_bits": block_bits or None,
+    }
+    if flags >> _WIDTH_SHIFT:
+        state["counter_width"] = flags >> _WIDTH_SHIFT
+    bloom.__setstate__(state)
+    return bloom
+
+
+def read_filter(cls, filename):
+    """
+        (cls) reads filter from binary file into memory
+        read_filter(
+            cls => class of the filter to create
+            filename => name of the file
+        )
+    """
+    with open(filename, "rb") as datafile:
+        header, hashes, _ = _read_header(datafile)
+        bits = _storage(header)
+        if datafile.readinto(bits.data) < len(bits.data):
+            raise FileFormatError(ERROR_MSGS.TRUNCATED_FILE)
+    return _restore(cls, header, hashes, bits)
+
+
+def open_filter(cls, filename, readonly=True):
+    """
+        (cls) memory maps filter from binary file, bits are not copied
+        open_filter(
+            cls => class of the filter to create
+            filename => name of the file
+            readonly => map file read-only, otherwise inserts are written
+                        straight to the file
+        )
+    """
+    with open(filename, "rb" if readonly else "r+b") as datafile:
+        header, hashes, offset = _read_header(datafile)
+        mapping = mmap.mmap(datafile.fileno(), 0, access=(
+            mmap.ACCESS_READ if readonly else mmap.ACCESS_WRITE
+        ))
+    bits = _storage(header, memoryview(mapping)[offset:])
+    bloom = _restore(cls, header, hashes, bits)
+    bloom._mapping = mapping
+    return bloom
+
+
+def sync_header(bloom):
+    """
+        (void) writes count and max_set of a writable memory mapped filter
+               back to its header and flushes the mapping
+    """
+    mapping = bloom._mapping
+    spec_length = HEADER.unpack_from(mapping)[8]
+    mapping[:HEADER.size] = pack_header(bloom, spec_length)
+    mapping.flush()
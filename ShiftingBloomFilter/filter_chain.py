@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Base of filters made of several ShiftingBloomFilters.
+    - FilterChain => fans inserts out to the newest filter of a chain and
+                     checks out to all of them, combining the results.
+
+Subclasses provide the filters and decide when a new one is opened:
+    - _filters() => live filters of the chain, oldest first
+    - _current() => newest filter, with room for another item
+    - _capacity() => number of items the newest filter is sized for
+"""
+
+# "The strength of the team is each individual member."
+#           ~ Phil Jackson
+
+
+class FilterChain:
+    """
+        FilterChain => base of filters made of a chain of ShiftingBloomFilter,
+                       all sharing the same mode.
+
+        Items are inserted into the newest filter, checks consult every
+        filter. For multiple sets set ids are merged, for multisets counts
+        are summed.
+    """
+
+    # default file name of save2file and load_from_file
+    FILENAME = "chain.bin"
+
+    def __len__(self):
+        """(int) returns total number of bits in all filters"""
+        return sum(len(bloom) for bloom in self._filters())
+
+    def __bool__(self):
+        """(boolean) returns if any filter is not empty"""
+        return any(self._filters())
+
+    def __contains__(self, item):
+        """(boolean) returns True on the newest filter that might hold item"""
+        return any(bloom.check(item)[0] for bloom in reversed(self._filters()))
+
+    @property
+    def count(self):
+        """(int) number of items inserted into all filters"""
+        return sum(bloom.count for bloom in self._filters())
+
+    def insert(self, item, set_no=0):
+        """
+            (void) inserts item into the newest filter
+            insert(
+                item => item to insert
+                set_no => which set is the item supposed to go in, by default 0
+                          if working with multiple sets.
+            )
+        """
+        self._current().insert(item, set_no)
+
+    def insert_many(self, items, set_nos=0):
+        """
+            (void) inserts every item, filling the newest filter up to its
+                   capacity before opening the next one.
+            insert_many(
+                items => iterable of items to insert
+                set_nos => set id for all items or an iterable with set id
+                           for every item, by default 0.
+            )
+        """
+        items = list(items)
+        set_nos = ([set_nos] * len(items) if isinstance(set_nos, int)
+                   else list(set_nos))
+        start = 0
+        while start < len(items):
+            bloom = self._current()
+            end = start + self._capacity() - bloom.count
+            bloom.insert_many(items[start:end], set_nos[start:end])
+            start = end
+
+    def _combine(self, results):
+        """
+            (boolean, list of set ids) or (boolean, count)
+            combines results of check from all filters, set ids are merged
+            and multiset counts summed.
+        """
+        if self.mode:
+            possible_sets = sorted(set().union(*(sets for _, sets in results)))
+            return (len(possible_sets) > 0, possible_sets)
+        count = sum(count for _, count in results)
+        return (count > 0, count)
+
+    def check(self, item):
+        """
+            (boolean, list of set ids that item might possibly be in) or
+            (boolean, possible count of items in the set)
+            checks the possibility of item being in a set, for multiple sets
+            set ids from all filters are merged, for multisets counts from
+            all filters are summed.
+            check(
+                item => item to check for
+            )
+        """
+        return self._combine([bloom.check(item) for bloom in self._filters()])
+
+    def check_many(self, items):
+        """
+            ([(boolean, list of set ids)]) or ([(boolean, count)])
+            checks every item, results are in the same order and shape as
+            returned by check.
+            check_many(
+                items => iterable of items to check for
+            )
+        """
+        items = list(items)
+        per_filter = [bloom.check_many(items) for bloom in self._filters()]
+        return [self._combine(results) for results in zip(*per_filter)]
+
+    def get_fpr(self):
+        """
+            (Number) returns false positve rate for current state
+            of the filter, the probability of a false positive in any
+            of the filters
+        """
+        true_negative = 1
+        for bloom in self._filters():
+            true_negative *= 1 - bloom.get_fpr()
+        return 1 - true_negative
+
+    def save2file(self, filename=None):
+        """(void) save filter to a binary file, by default FILENAME"""
+
+        import pickle
+        with open(filename or self.FILENAME, "wb") as datafile:
+            pickle.dump(self, datafile)
+
+    @classmethod
+    def load_from_file(cls, filename=None):
+        """
+            (class) (FilterChain)
+            restore a filter from binary file, by default FILENAME.
+        """
+        import pickle
+        with open(filename or cls.FILENAME, "rb") as sbf:
+            return pickle.load(sbf)
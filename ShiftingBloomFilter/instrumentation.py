@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Opt-in instrumentation of ShiftingBloomFilter hot paths.
+    - FilterStats => counters of hashing, offset scans and set bits of one
+                     filter, created by ShiftingBloomFilter.enable_stats.
+
+Filters without stats only pay a check of a single attribute per
+operation. Counters are plain integers, they are not synchronised between
+threads.
+"""
+
+# "What gets measured gets managed."
+#           ~ Peter Drucker
+
+from collections import deque
+from time import perf_counter_ns
+
+COUNTERS = (
+    "inserts",
+    "checks",
+    "digests",
+    "hash_ns",
+    "offsets_scanned",
+    "max_scan",
+    "bits_set",
+    "bits_already_set",
+)
+
+
+class FilterStats:
+    """
+        FilterStats => counters of the hot paths of one filter.
+
+        Counters:
+        - inserts, checks => number of inserted and checked items
+        - digests => number of hash digests computed
+        - hash_ns => nanoseconds spent computing digests
+        - offsets_scanned => number of offsets probed while scanning sets
+                             (or multiplicities) of items
+        - max_scan => most offsets probed for a single item
+        - bits_set, bits_already_set => positions newly set by inserts and
+                                        positions that were already set
+        - slow_keys => last keys whose scan probed at least slow_scan
+                       offsets, as (key, offsets probed) pairs
+    """
+
+    def __init__(self, snapshot, sink=None, every=10000, slow_scan=100,
+                 slow_keys=16):
+        """
+        FilterStats(
+            snapshot => function returning stats dict of the filter
+            sink => function called with stats dict every every operations,
+                    by default stats are only read with snapshot
+            every => number of inserts and checks between calls of sink
+            slow_scan => scans probing this many offsets record their key
+            slow_keys => number of slow keys to keep
+        )
+        """
+        self.snapshot = snapshot
+        self.sink = sink
+        self.every = every
+        self.slow_scan = slow_scan
+        self.slow_keys = deque(maxlen=slow_keys)
+        self.reset()
+
+    def __repr__(self):
+        """return string representation of the counters"""
+        return "FilterStats(%s)" % ", ".join(
+            "%s=%s" % (name, getattr(self, name)) for name in COUNTERS
+        )
+
+    def reset(self):
+        """(void) zeroes all counters and forgets slow keys"""
+        for name in COUNTERS:
+            setattr(self, name, 0)
+        self.last_scan = 0
+        self.slow_keys.clear()
+
+    def counters(self):
+        """(dict) returns current values of all counters"""
+        counters = {name: getattr(self, name) for name in COUNTERS}
+        counters["slow_keys"] = list(self.slow_keys)
+        return counters
+
+    @staticmethod
+    def clock():
+        """(int) returns current time in nanoseconds"""
+        return perf_counter_ns()
+
+    def operation(self, name, items=1):
+        """
+            (void) counts items inserted or checked and calls sink with the
+                   snapshot every every operations.
+            operation(
+                name => "inserts" or "checks"
+                items => number of items of the operation
+            )
+        """
+        before = self.inserts + self.checks
+        setattr(self, name, getattr(self, name) + items)
+        if (self.sink is not None
+                and before // self.every != (before + items) // self.every):
+            self.sink(self.snapshot())
+
+    def hashed(self, digests, started):
+        """(void) counts digests computed since started (clock value)"""
+        self.digests += digests
+        self.hash_ns += perf_counter_ns() - started
+
+    def scanned(self, offsets, items=1):
+        """(void) counts offsets probed for each of items items"""
+        self.offsets_scanned += offsets * items
+        self.last_scan = offsets
+        if offsets > self.max_scan:
+            self.max_scan = offsets
+
+    def key(self, item):
+        """(void) records item if its last scan was slow"""
+        if self.last_scan >= self.slow_scan:
+            self.slow_keys.append((item, self.last_scan))
+        self.last_scan = 0
+
+    def bits(self, newly, total):
+        """(void) counts positions newly set and already set by an insert"""
+        self.bits_set += newly
+        self.bits_already_set += total - newly
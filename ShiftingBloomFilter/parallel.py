@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Parallel bulk building of ShiftingBloomFilter.
+    - build_parallel => fill a filter from an iterable using a pool of
+                        worker processes.
+
+Every worker process fills its own partial filter, stored in a shared
+memory segment, so partial bit arrays are never pickled back. When the
+input is exhausted the partial filters are merged by bitwise or.
+"""
+
+# "Many hands make light work."
+#           ~ John Heywood
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+from .bit_array import BitArray
+from .shifting_bloom_filter import ShiftingBloomFilter
+
+# state of the worker process, set by _init_worker
+_worker = {}
+
+
+def _init_worker(segments, state):
+    """
+        (void) attaches worker process to a free shared memory segment and
+               creates its partial filter over it.
+    """
+    shm = SharedMemory(name=segments.get())
+    bloom = ShiftingBloomFilter.__new__(ShiftingBloomFilter)
+    bloom.__setstate__(dict(
+        state, filter=BitArray.from_buffer(state["m"], shm.buf), count=0,
+        _bit_count=0
+    ))
+    _worker["shm"] = shm
+    _worker["bloom"] = bloom
+
+
+def _insert_chunk(keys, set_nos):
+    """
+        ((int, int)) inserts chunk into partial filter of the worker,
+                     returns number of inserted items and max_set
+    """
+    bloom = _worker["bloom"]
+    bloom.insert_many(keys, set_nos)
+    return len(keys), bloom.max_set
+
+
+def _chunks(iterable, key_of, set_of, chunk_size):
+    """(generator) yields ([keys], [set ids]) chunks of the input"""
+    keys, set_nos = [], []
+    for item in iterable:
+        keys.append(key_of(item) if key_of is not None else item)
+        set_nos.append(set_of(item) if set_of is not None else 0)
+        if len(keys) == chunk_size:
+            yield keys, set_nos
+            keys, set_nos = [], []
+    if keys:
+        yield keys, set_nos
+
+
+def build_parallel(iterable, workers=None, set_of=None, key_of=None,
+                   bloom=None, chunk_size=10000, **filter_args):
+    """
+        (ShiftingBloomFilter) inserts every item of iterable into a filter
+        using a pool of worker processes, hashing is done by the workers.
+        build_parallel(
+            iterable => items to insert, for example utils.CSVDataSet
+            workers => number of worker processes, by default cpu count
+            set_of => function returning set id of an item, by default
+                      every item goes to set 0
+            key_of => function returning key of an item, by default the
+                      item itself is the key
+            bloom => MULTIPLE mode filter stored in a BitArray (not a
+                     counting filter) to insert into, by default a new
+                     ShiftingBloomFilter(**filter_args) is created
+            chunk_size => number of items sent to a worker at once
+            **filter_args => arguments of the created ShiftingBloomFilter
+        )
+
+        count of the filter is increased by the number of inserted items
+        and max_set is the highest set id seen by any worker.
+    """
+    if bloom is None:
+        bloom = ShiftingBloomFilter(**filter_args)
+    if not bloom.mode:
+        raise ValueError("build_parallel supports only MULTIPLE mode filters,"
+                         " multiset counts depend on insertion order.")
+    if not isinstance(bloom.filter, BitArray):
+        raise ValueError("build_parallel supports only filters stored in a "
+                         "BitArray, partial filters are merged bitwise.")
+    workers = workers or multiprocessing.cpu_count()
+    state = bloom.__getstate__()
+    del state["filter"]
+    size = len(bloom.filter.data)
+    segments = [SharedMemory(create=True, size=size) for _ in range(workers)]
+    free = multiprocessing.Queue()
+    for shm in segments:
+        free.put(shm.name)
+    try:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker,
+                                 initargs=(free, state)) as executor:
+            pending = deque()
+            results = []
+            for keys, set_nos in _chunks(iterable, key_of, set_of,
+                                         chunk_size):
+                pending.append(executor.submit(_insert_chunk, keys, set_nos))
+                if len(pending) > 2 * workers:
+                    results.append(pending.popleft().result())
+            results.extend(future.result() for future in pending)
+        for shm in segments:
+            partial = BitArray.from_buffer(bloom.m, shm.buf)
+            try:
+                bloom.filter.union_update(partial)
+            finally:
+                partial.data.release()
+        bloom._recount()
+    finally:
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+    for inserted, max_set in results:
+        bloom.count += inserted
+        bloom.max_set = max(bloom.max_set, max_set)
+    return bloom
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Scalable shifting bloom filter, growing with the number of inserted items.
+    - ScalableShiftingBloomFilter => chain of ShiftingBloomFilter stages of
+                                     geometrically increasing size.
+"""
+
+# "Great things are not done by impulse,
+#  but by a series of small things brought together."
+#           ~ Vincent van Gogh
+
+import math
+from .shifting_bloom_filter import ShiftingBloomFilter, MULTIPLE
+from .fast_hash import CAPACITY_HASH_SOURCE
+from .filter_chain import FilterChain
+
+
+class ScalableShiftingBloomFilter(FilterChain):
+    """
+        ScalableShiftingBloomFilter => shifting bloom filter without a fixed
+                                       capacity.
+
+        Items are inserted into the newest stage, once it holds as many
+        items as it was sized for, a new stage growth times larger is
+        opened. Every stage gets false positive rate tightening times lower
+        than the previous one, so the total false positive rate stays below
+        error_rate however many stages are opened.
+    """
+
+    FILENAME = "ssbf.bin"
+
+    def __init__(self, initial_capacity=1000, error_rate=0.001, set_count=0,
+                 mode=MULTIPLE, growth=2, tightening=0.9,
+                 hash_source=CAPACITY_HASH_SOURCE):
+        """
+        ScalableShiftingBloomFilter(
+            initial_capacity => number of items the first stage is sized for
+            error_rate => upper bound of false positive rate of the filter
+            set_count => how many sets is this filter supposed to support?
+            mode => MULTIPLE if there are multiple sets or MULTISET if its one
+                    set but supporting multiple elements.
+            growth => capacity of every stage relative to the previous one
+            tightening => false positive rate of every stage relative to the
+                          previous one, 0 < tightening < 1
+            hash_source => hash source of stages, as in
+                           ShiftingBloomFilter.for_capacity
+        )
+
+        public methods:
+        - insert(item, set_no) => insert item into newest stage
+        - check(item) => check if item is in any stage
+        - insert_many(items, set_nos) => insert every item
+        - check_many(items) => check every item, returns list of results
+        - get_fpr() => false positive rate of the whole filter
+        - save2file(filename) => save filter to file
+        - (class) load_from_file(filename) => load filter from file
+
+        ** supports: **
+        - len (total number of bits in all stages)
+        - in (short-circuits on the first stage that might hold the item)
+        """
+        if not 0 < tightening < 1:
+            raise ValueError("tightening has to be between 0 and 1.")
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.set_count = set_count
+        self.mode = mode
+        self.growth = growth
+        self.tightening = tightening
+        self.hash_source = hash_source
+        self.stages = []
+        self.capacities = []
+        self._add_stage()
+
+    def __repr__(self):
+        """return string representation of an object constructor"""
+        return "ScalableShiftingBloomFilter(%s, %s, %s, %s, %s, %s, %s)" % (
+            self.initial_capacity,
+            self.error_rate,
+            self.set_count,
+            self.mode,
+            self.growth,
+            self.tightening,
+            self.hash_source
+        )
+
+    def _add_stage(self):
+        """(void) opens a new, larger and tighter stage"""
+        number = len(self.stages)
+        capacity = math.ceil(self.initial_capacity * self.growth ** number)
+        fpr = (self.error_rate * (1 - self.tightening)
+               * self.tightening ** number)
+        self.stages.append(ShiftingBloomFilter.for_capacity(
+            capacity, fpr, set_count=self.set_count, mode=self.mode,
+            hash_source=self.hash_source
+        ))
+        self.capacities.append(capacity)
+
+    def _current(self):
+        """(ShiftingBloomFilter) returns stage with room for another item"""
+        if self.stages[-1].count >= self.capacities[-1]:
+            self._add_stage()
+        return self.stages[-1]
+
+    def _filters(self):
+        """([ShiftingBloomFilter]) returns all stages, oldest first"""
+        return self.stages
+
+    def _capacity(self):
+        """(int) returns number of items the newest stage is sized for"""
+        return self.capacities[-1]
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Asyncio membership service wrapping a ShiftingBloomFilter.
+    - MembershipServer => serves check and insert requests over a line
+                          protocol, coalescing concurrent requests into
+                          batched check_many/insert_many calls.
+
+Line protocol, one UTF-8 request per line, replies come in request order
+(requests may be pipelined):
+    - CHECK <key> => JSON result of check, [true, [0, 2]] for multiple
+                     sets (possible set ids), [true, 5] for multisets
+                     (possible count)
+    - INSERT <set_no> <key> => OK, set_no is an ASCII decimal up to
+                               max_set_no, ignored by multisets
+    - anything else => ERR <reason>
+
+Usage:
+    python3 -m ShiftingBloomFilter.server filter.sbf [--port 8765]
+"""
+
+# "The whole is greater than the sum of its parts."
+#           ~ Aristotle
+
+import argparse
+import asyncio
+from itertools import groupby
+import json
+
+CHECK = "CHECK"
+INSERT = "INSERT"
+
+
+class MembershipServer:
+    """
+        MembershipServer => asyncio service answering membership queries
+                            of a single filter.
+
+        Requests arriving within window seconds of the first pending one
+        are answered by one check_many (or insert_many) call, runs of
+        inserts and checks are kept in arrival order, so a check always
+        sees earlier inserts. Filter is only touched from the event loop.
+    """
+
+    def __init__(self, bloom, window=0.0005, max_batch=1024,
+                 max_set_no=1023):
+        """
+        MembershipServer(
+            bloom => filter to serve, any filter with check_many and
+                     insert_many
+            window => seconds to wait for more requests before a batch is
+                      processed, 0 coalesces requests of one loop iteration
+            max_batch => batch is processed at once when it has this many
+                         requests
+            max_set_no => highest set id accepted by INSERT requests, so a
+                          client can not make checks scan unbounded
+                          offsets
+        )
+
+        public methods:
+        - (async) check(item) => result of bloom.check(item)
+        - (async) insert(item, set_no) => bloom.insert(item, set_no)
+        - (async) start(host, port, path) => start serving, returns server
+        - flush() => process pending requests now
+
+        batches and requests count processed batches and requests.
+        """
+        self.bloom = bloom
+        self.window = window
+        self.max_batch = max_batch
+        self.max_set_no = max_set_no
+        self.batches = 0
+        self.requests = 0
+        self._pending = []
+        self._timer = None
+
+    def __repr__(self):
+        """return string representation of an object constructor"""
+        return "MembershipServer(%r, %s, %s, %s)" % (
+            self.bloom, self.window, self.max_batch, self.max_set_no
+        )
+
+    def _submit(self, op, item, set_no=0):
+        """(Future) queues request, result is set when its batch is done"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((op, item, set_no, future))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self.flush)
+        return future
+
+    def check(self, item):
+        """
+            (awaitable) (boolean, list of set ids) or (boolean, count)
+            checks item in the next batch, result is that of bloom.check
+            check(
+                item => item to check for
+            )
+        """
+        return self._submit(CHECK, item)
+
+    def insert(self, item, set_no=0):
+        """
+            (awaitable) (None) inserts item in the next batch
+            insert(
+                item => item to insert
+                set_no => which set is the item supposed to go in
+            )
+        """
+        return self._submit(INSERT, item, set_no)
+
+    def flush(self):
+        """(void) processes all pending requests as batches"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.batches += 1
+        self.requests += len(batch)
+        for op, run in groupby(batch, key=lambda request: request[0]):
+            run = list(run)
+            try:
+                items = [item for _, item, _, _ in run]
+                if op == CHECK:
+                    results = self.bloom.check_many(items)
+                else:
+                    self.bloom.insert_many(
+                        items, [set_no for _, _, set_no, _ in run]
+                    )
+                    results = [None] * len(run)
+            except Exception as error:
+                for *_, future in run:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            for (*_, future), result in zip(run, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _request(self, line):
+        """
+            ((Future, op)) parses one protocol line and submits it,
+            op is None for replies that are already complete
+        """
+        command, _, rest = line.rstrip(b"\r\n").decode(
+            "utf-8", "replace"
+        ).partition(" ")
+        if command == CHECK:
+            return self.check(rest), CHECK
+        if command == INSERT:
+            set_no, _, key = rest.partition(" ")
+            if (set_no.isascii() and set_no.isdigit()
+                    and len(set_no) <= len(str(self.max_set_no))
+                    and int(set_no) <= self.max_set_no):
+                return self.insert(key, int(set_no)), INSERT
+            reply = ("ERR set_no has to be an integer from 0 to %d"
+                     % self.max_set_no)
+        else:
+            reply = "ERR unknown command %r" % command
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(reply)
+        return future, None
+
+    @staticmethod
+    async def _send(replies, writer):
+        """(void) writes replies of one connection in request order"""
+        while True:
+            request = await replies.get()
+            if request is None:
+                return
+            future, op = request
+            try:
+                result = await future
+                if op == CHECK:
+                    reply = json.dumps(result)
+                elif op == INSERT:
+                    reply = "OK"
+                else:
+                    reply = result
+            except Exception as error:
+                reply = "ERR %s" % error
+            writer.write(reply.encode() + b"\n")
+            if replies.empty():
+                await writer.drain()
+
+    async def _handle(self, reader, writer):
+        """(void) serves one connection until the client closes it"""
+        replies = asyncio.Queue()
+        sender = asyncio.ensure_future(self._send(replies, writer))
+        try:
+            async for line in reader:
+                replies.put_nowait(self._request(line))
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            replies.put_nowait(None)
+            try:
+                await sender
+            except ConnectionError:
+                pass
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=0, path=None):
+        """
+            (asyncio.Server) starts serving the line protocol
+            start(
+                host => address to listen on
+                port => port to listen on, 0 picks a free one
+                path => listen on this unix socket instead of host and port
+            )
+        """
+        if path is not None:
+            return await asyncio.start_unix_server(self._handle, path)
+        return await asyncio.start_server(self._handle, host, port)
+
+
+async def _serve(server, host, port, path):
+    """(void) serves until cancelled"""
+    listener = await server.start(host, port, path)
+    for sock in listener.sockets:
+        print("serving on %s" % (sock.getsockname(),))
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    """serves filter saved by save_binary"""
+    from .shifting_bloom_filter import ShiftingBloomFilter
+    parser = argparse.ArgumentParser(description="Serve a filter saved by "
+                                                 "save_binary.")
+    parser.add_argument("filename")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="unix socket path")
+    parser.add_argument("--window", type=float, default=0.0005)
+    parser.add_argument("--max-batch", type=int, default=1024)
+    parser.add_argument("--max-set-no", type=int, default=1023,
+                        help="highest set id accepted by INSERT")
+    args = parser.parse_args()
+    bloom = ShiftingBloomFilter.load_binary(args.filename)
+    server = MembershipServer(bloom, args.window, args.max_batch,
+                              args.max_set_no)
+    try:
+        asyncio.run(_serve(server, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Sharded shifting bloom filter, partitioning keys across sub-filters.
+    - ShardedShiftingBloomFilter => ShiftingBloomFilter split into shards
+                                    with identical parameters, each key is
+                                    routed to one shard by a hash of (a
+                                    prefix of) its bytes.
+
+Shards are saved as separate files written by save_binary, next to a
+JSON manifest recording the version of every shard, a random token
+drawn anew every time the shard is written:
+
+    directory/manifest.json
+    directory/shard-00000.sbf
+    ...
+
+Only shards changed since the last save are written again, so a delta
+of a large filter is the changed shard files plus the manifest. refresh
+reloads only the shards whose version in the manifest changed.
+"""
+
+# "Divide et impera."
+#           ~ Julius Caesar
+
+import math
+import os
+from .shifting_bloom_filter import ShiftingBloomFilter, encode_key
+from .fast_hash import xxh64
+from .exceptions import FileFormatError, ERROR_MSGS
+
+MANIFEST = "manifest.json"
+MANIFEST_VERSION = 1
+SHARD_FILE = "shard-%05d.sbf"
+
+# random bytes in the version token of a written shard
+VERSION_BYTES = 8
+
+# seed of the routing hash, keeps routing independent of filter hashing
+ROUTE_SEED = 0x5AD
+
+# arguments of filter subclasses copied to every shard when present
+SHARD_ATTRIBUTES = ("counter_width", "stripes")
+
+
+def _same_shape(bloom, shard_class):
+    """(shard_class) returns empty filter with the parameters of bloom"""
+    extra = {name: getattr(bloom, name) for name in SHARD_ATTRIBUTES
+             if hasattr(bloom, name)}
+    return shard_class(
+        bloom.m, hash_source=bloom.hashfunc, hash_count=bloom.k,
+        length_as_power=False, mode=bloom.mode, set_count=bloom.max_set,
+        max_count=bloom.max_count, block_bits=bloom.block_bits, **extra
+    )
+
+
+def _new_version():
+    """(str) returns version token unique to one write of a shard"""
+    return os.urandom(VERSION_BYTES).hex()
+
+
+def _replace_file(shard, path):
+    """(void) writes shard with save_binary, replacing path atomically"""
+    temporary = path + ".tmp"
+    shard.save_binary(temporary)
+    os.replace(temporary, path)
+
+
+class ShardedShiftingBloomFilter:
+    """
+        ShardedShiftingBloomFilter => shifting bloom filter made of
+                                      independent shards.
+
+        Every key lives in exactly one shard, so a check probes a single
+        shard, shards can be saved, loaded and rebuilt one at a time and
+        batches are processed shard by shard in parallel. With
+        prefix_bytes keys are routed by their first prefix_bytes bytes
+        only, so keys sharing a prefix (a tenant, a date) change the same
+        shard.
+    """
+
+    def __init__(self, length, shard_count=16, prefix_bytes=None,
+                 workers=None, shard_class=ShiftingBloomFilter,
+                 **filter_args):
+        """
+        ShardedShiftingBloomFilter(
+            length => length of every shard, as in ShiftingBloomFilter
+            shard_count => number of shards
+            prefix_bytes => route keys by their first prefix_bytes bytes,
+                            None routes by the whole key
+            workers => number of threads processing shards of batches,
+                       saves and loads, None or 1 processes them in turn
+            shard_class => class of the shards, for example
+                           ConcurrentShiftingBloomFilter
+            **filter_args => other arguments of every shard, as in
+                             ShiftingBloomFilter
+        )
+
+        public methods:
+        - insert(item, set_no) => insert item into its shard
+        - check(item) => check item in its shard
+        - insert_many(items, set_nos) => insert every item, shard by shard
+        - check_many(items) => check every item, returns list of results
+        - shard_of(item) => index of the shard of item
+        - get_fpr() => false positive rate of the whole filter
+        - save(directory, only_dirty) => save shards and manifest
+        - (class) load(directory, ...) => load filter saved by save
+        - refresh() => reload shards changed in the directory
+
+        ** supports: **
+        - len (total number of bits in all shards)
+        - in
+        """
+        self._setup([shard_class(length, **filter_args)
+                     for _ in range(shard_count)],
+                    prefix_bytes, workers)
+
+    def _setup(self, shards, prefix_bytes, workers, versions=None,
+               directory=None, mapped=False):
+        """(void) sets shards and routing, all shards are dirty if unsaved"""
+        if not shards:
+            raise ValueError("shard_count has to be positive.")
+        self.shards = shards
+        self.shard_count = len(shards)
+        self.prefix_bytes = prefix_bytes
+        self.workers = workers
+        self.versions = versions or [None] * len(shards)
+        self.directory = directory
+        self.dirty = set() if directory else set(range(len(shards)))
+        self._mapped = mapped
+
+    @classmethod
+    def for_capacity(cls, n, target_fpr, shard_count=16, prefix_bytes=None,
+                     workers=None, shard_class=ShiftingBloomFilter,
+                     **filter_args):
+        """
+            (class) (ShardedShiftingBloomFilter)
+            creates shards sized by ShiftingBloomFilter.for_capacity for an
+            even share of n insertions each.
+            for_capacity(
+                n => expected number of insertions into all shards
+                target_fpr => desired false positive rate, 0 < target_fpr < 1
+                shard_count, prefix_bytes, workers, shard_class => as in
+                                                  ShardedShiftingBloomFilter
+                **filter_args => other arguments of
+                                 ShiftingBloomFilter.for_capacity
+            )
+
+            ** NOTE: routing by a prefix can fill shards unevenly, the
+                     fullest shard then exceeds target_fpr. **
+        """
+        first = shard_class.for_capacity(math.ceil(n / shard_count),
+                                         target_fpr, **filter_args)
+        sharded = cls.__new__(cls)
+        sharded._setup([first] + [_same_shape(first, shard_class)
+                                  for _ in range(shard_count - 1)],
+                       prefix_bytes, workers)
+        return sharded
+
+    def __repr__(self):
+        """return string representation of an object constructor"""
+        return ("ShardedShiftingBloomFilter(%s, %s, %s, %s, "
+                "length_as_power=False)" % (
+                    self.shards[0].m,
+                    self.shard_count,
+                    self.prefix_bytes,
+                    self.workers
+                ))
+
+    def __len__(self):
+        """(int) returns total number of bits in all shards"""
+        return sum(len(shard) for shard in self.shards)
+
+    def __bool__(self):
+        """(boolean) returns if any shard is not empty"""
+        return any(self.shards)
+
+    def __contains__(self, item):
+        """(boolean) returns if item might be in its shard"""
+        return self.shards[self.shard_of(item)].check(item)[0]
+
+    @property
+    def count(self):
+        """(int) number of items inserted into all shards"""
+        return sum(shard.count for shard in self.shards)
+
+    def shard_of(self, item):
+        """
+            (int) returns index of the shard item is routed to
+            shard_of(
+                item => key, as accepted by ShiftingBloomFilter.insert
+            )
+        """
+        key = encode_key(item)
+        if self.prefix_bytes is not None:
+            key = key[:self.prefix_bytes]
+        return xxh64(key, ROUTE_SEED) % self.shard_count
+
+    def _map(self, function, arguments):
+        """([result]) calls function for every argument, in threads"""
+        if not self.workers or self.workers == 1 or len(arguments) < 2:
+            return [function(argument) for argument in arguments]
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(function, arguments))
+
+    def insert(self, item, set_no=0):
+        """
+            (void) inserts item into its shard
+            insert(
+                item => item to insert
+                set_no => which set is the item supposed to go in, by default 0
+                          if working with multiple sets.
+            )
+        """
+        index = self.shard_of(item)
+        self.shards[index].insert(item, set_no)
+        self.dirty.add(index)
+
+    def _partition(self, items):
+        """({shard index: [positions]}) groups positions of items by shard"""
+        groups = {}
+        for position, item in enumerate(items):
+            groups.setdefault(self.shard_of(item), []).append(position)
+        return groups
+
+    def insert_many(self, items, set_nos=0):
+        """
+            (void) inserts every item, items of different shards are
+                   inserted in parallel.
+            insert_many(
+                items => iterable of items to insert
+                set_nos => set id for all items or an iterable with set id
+                           for every item, by default 0.
+            )
+        """
+        items = list(items)
+        if not isinstance(set_nos, int):
+            set_nos = list(set_nos)
+        groups = self._partition(items)
+
+        def insert_group(index):
+            positions = groups[index]
+            self.shards[index].insert_many(
+                [items[position] for position in positions],
+                set_nos if isinstance(set_nos, int)
+                else [set_nos[position] for position in positions]
+            )
+
+        self._map(insert_group, list(groups))
+        self.dirty.update(groups)
+
+    def check(self, item):
+        """
+            (boolean, list of set ids that item might possibly be in) or
+            (boolean, possible count of items in the set)
+            checks item in its shard, result is that of
+            ShiftingBloomFilter.check
+            check(
+                item => item to check for
+            )
+        """
+        return self.shards[self.shard_of(item)].check(item)
+
+    def check_many(self, items):
+        """
+            ([(boolean, list of set ids)]) or ([(boolean, count)])
+            checks every item, items of different shards are checked in
+            parallel. Results are in the same order and shape as returned
+            by check.
+            check_many(
+                items => iterable of items to check for
+            )
+        """
+        items = list(items)
+        groups = self._partition(items)
+
+        def check_group(index):
+            return self.shards[index].check_many(
+                [items[position] for position in groups[index]]
+            )
+
+        results = [None] * len(items)
+        for index, found in zip(groups, self._map(check_group, list(groups))):
+            for position, result in zip(groups[index], found):
+                results[position] = result
+        return results
+
+    def get_fpr(self):
+        """
+            (Number) returns false positve rate for current state
+            of the filter, a key is checked in one shard so this is the
+            mean of false positive rates of shards
+        """
+        return sum(shard.get_fpr() for shard in self.shards) / self.shard_count
+
+    def _manifest(self):
+        """(dict) returns manifest describing saved shards"""
+        return {
+            "version": MANIFEST_VERSION,
+            "prefix_bytes": self.prefix_bytes,
+            "route_seed": ROUTE_SEED,
+            "shards": [
+                {"file": SHARD_FILE % index, "version": version,
+                 "count": shard.count}
+                for index, (shard, version) in enumerate(zip(self.shards,
+                                                             self.versions))
+            ],
+        }
+
+    def save(self, directory, only_dirty=True):
+        """
+            (list of shard indices) saves shards and manifest to directory,
+            returns indices of the written shards. Files are replaced
+            atomically, the manifest is written last.
+            save(
+                directory => directory for shard files and manifest,
+                             created if missing
+                only_dirty => write only shards changed since the filter
+                              was last saved to or loaded from directory
+            )
+        """
+        os.makedirs(directory, exist_ok=True)
+        same = (self.directory is not None
+                and os.path.realpath(directory) == self.directory)
+        written = sorted(self.dirty if only_dirty and same
+                         else range(self.shard_count))
+        for index in written:
+            self.versions[index] = _new_version()
+        self._map(lambda index: _replace_file(
+            self.shards[index], os.path.join(directory, SHARD_FILE % index)
+        ), written)
+        import json
+        temporary = os.path.join(directory, MANIFEST + ".tmp")
+        with open(temporary, "w") as datafile:
+            json.dump(self._manifest(), datafile, indent=1)
+        os.replace(temporary, os.path.join(directory, MANIFEST))
+        self.directory = os.path.realpath(directory)
+        self.dirty.clear()
+        return written
+
+    @staticmethod
+    def _read_manifest(directory):
+        """(dict) reads and validates manifest of directory"""
+        import json
+        try:
+            with open(os.path.join(directory, MANIFEST)) as datafile:
+                manifest = json.load(datafile)
+            if (manifest["version"] != MANIFEST_VERSION
+                    or manifest["route_seed"] != ROUTE_SEED
+                    or not manifest["shards"]):
+                raise FileFormatError(ERROR_MSGS.NOT_A_MANIFEST)
+        except (ValueError, KeyError, TypeError):
+            raise FileFormatError(ERROR_MSGS.NOT_A_MANIFEST) from None
+        return manifest
+
+    @staticmethod
+    def _load_shard(shard_class, directory, entry, mapped):
+        """(shard_class) loads shard described by manifest entry"""
+        path = os.path.join(directory, entry["file"])
+        if mapped:
+            return shard_class.open_mmap(path)
+        return shard_class.load_binary(path)
+
+    @classmethod
+    def load(cls, directory, workers=None, shard_class=ShiftingBloomFilter,
+             mapped=False):
+        """
+            (class) (ShardedShiftingBloomFilter)
+            loads filter saved by save.
+            load(
+                directory => directory with shard files and manifest
+                workers => as in ShardedShiftingBloomFilter, also loads
+                           shards in parallel
+                shard_class => class of the shards
+                mapped => memory map shard files read-only instead of
+                          reading them into memory
+            )
+        """
+        manifest = cls._read_manifest(directory)
+        sharded = cls.__new__(cls)
+        sharded.workers = workers
+        entries = manifest["shards"]
+        shards = sharded._map(lambda entry: cls._load_shard(
+            shard_class, directory, entry, mapped
+        ), entries)
+        sharded._setup(shards, manifest["prefix_bytes"], workers,
+                       [entry["version"] for entry in entries],
+                       os.path.realpath(directory), mapped)
+        return sharded
+
+    def refresh(self):
+        """
+            (list of shard indices) reloads shards whose version in the
+            manifest of the directory changed since they were saved or
+            loaded, returns indices of the reloaded shards. Reloaded
+            shards replace local ones, local changes to them are lost.
+        """
+        if self.directory is None:
+            raise ValueError("Filter was not saved or loaded yet.")
+        manifest = self._read_manifest(self.directory)
+        entries = manifest["shards"]
+        if (len(entries) != self.shard_count
+                or manifest["prefix_bytes"] != self.prefix_bytes):
+            raise FileFormatError(ERROR_MSGS.NOT_A_MANIFEST)
+        changed = [index for index, entry in enumerate(entries)
+                   if entry["version"] != self.versions[index]]
+        shard_class = type(self.shards[0])
+        shards = self._map(lambda index: self._load_shard(
+            shard_class, self.directory, entries[index], self._mapped
+        ), changed)
+        for index, shard in zip(changed, shards):
+            self.shards[index].close()
+            self.shards[index] = shard
+            self.versions[index] = entries[index]["version"]
+            self.dirty.discard(index)
+        return changed
+
+    def close(self):
+        """(void) releases memory mapped shard files"""
+        for shard in self.shards:
+            shard.close()
+
+    def __enter__(self):
+        """returns the filter itself"""
+        return self
+
+    def __exit__(self, *args):
+        """closes memory mapped shard files"""
+        self.close()
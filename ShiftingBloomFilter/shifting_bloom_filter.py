@@ -6,14 +6,257 @@
 
 import hashlib
 from hashlib import algorithms_guaranteed
-import pickle as pickle
 from sys import byteorder
 import math
+import copy
+from itertools import islice
+import reprlib
+from functools import partial
 from .exceptions import HashesUnavailableError, ERROR_MSGS
+from .exceptions import IncompatibleFiltersError
+from .bit_array import BitArray, _numpy
+from .fast_hash import FAST_HASH, FastHashFamily, xxh64
+from .fast_hash import CAPACITY_HASH_SOURCE
+from .instrumentation import FilterStats
 
 MULTIPLE = True
 MULTISET = not MULTIPLE
 
+# upper bound on the number of positions probed at once by check_many
+BATCH_POSITIONS = 1 << 22
+
+# hash functions used by default (hashlib without 'shake'), shared by
+# all filters
+DEFAULT_HASHES = tuple(getattr(hashlib, name) for name in algorithms_guaranteed
+                       if "shake" not in name.lower())
+DEFAULT_HASH_COUNT = len(DEFAULT_HASHES)
+
+# attributes derived from hashfunc, bound to an open file or recording
+# stats of this instance, rebuilt instead of being pickled
+_DERIVED_STATE = ("_base_fns", "_offset_fns", "_base_digesters",
+                  "_offset_digesters", "_mapping", "_stats")
+
+
+# largest number of hash functions considered by for_capacity
+MAX_HASH_COUNT = 64
+
+# longest str of the filter is limited to this many bits (or counters),
+# longest repr to this many characters of hash source
+STR_LIMIT = 1024
+REPR_LIMIT = 80
+
+# size of a cache line in bits, a natural block size for blocked filters
+CACHE_LINE_BITS = 512
+
+# up to this many offsets (max_set + 1) are probed one by one, wider
+# ranges are read as windows of bits
+PROBE_WIDTH = 8
+
+# seed of the hash selecting the block of a key in blocked filters
+BLOCK_SEED = 0x5BF
+
+# prefix of encoded int keys, a byte that never occurs in UTF-8
+INT_TAG = b"\xff"
+
+
+def shifting_fpr(count, length, hash_count, max_set):
+    """
+        (Number) returns false positive rate of a shifting bloom filter
+        shifting_fpr(
+            count => number of inserted items
+            length => number of bits in the filter
+            hash_count => number of hash functions
+            max_set => highest set id (or offset) in the filter
+        )
+    """
+    p = math.e ** ((-count * hash_count)/length)
+    return ((1-p)**(hash_count/2)) * (1 - p + (1/(max_set+1)) * (p**2))
+
+
+def blocked_fpr(count, length, hash_count, max_set, block_bits):
+    """
+        (Number) returns false positive rate of a blocked shifting bloom
+        filter. Items per block follow a Poisson distribution, the rate is
+        the rate of a block_bits long shifting filter averaged over it.
+        blocked_fpr(
+            count => number of inserted items
+            length => number of bits in the filter
+            hash_count => number of hash functions
+            max_set => highest set id (or offset) in the filter
+            block_bits => number of bits in a block
+        )
+    """
+    load = count * block_bits / length
+    if not load:
+        return 0.0
+    spread = 10 * math.sqrt(load) + 10
+    fpr = 0.0
+    for items in range(max(0, int(load - spread)), int(load + spread)):
+        weight = math.exp(items * math.log(load) - load
+                          - math.lgamma(items + 1))
+        fpr += weight * shifting_fpr(items, block_bits, hash_count, max_set)
+    return fpr
+
+
+def fill_fpr(fill, hash_count, max_set):
+    """
+        (Number) returns false positive rate of a shifting bloom filter
+        estimated from the share of its set bits, assuming every position
+        of a key not in the filter is set with that probability.
+        fill_fpr(
+            fill => share of set bits, 0 <= fill <= 1
+            hash_count => number of hash functions
+            max_set => highest set id (or offset) in the filter
+        )
+    """
+    base = hash_count // 2
+    shifted = hash_count - base
+    return fill ** base * (1 - (1 - fill ** shifted) ** (max_set + 1))
+
+
+def _fpr(count, length, hash_count, max_set, block_bits=None):
+    """(Number) returns false positive rate of plain or blocked filter"""
+    if block_bits:
+        return blocked_fpr(count, length, hash_count, max_set, block_bits)
+    return shifting_fpr(count, length, hash_count, max_set)
+
+
+def _min_length(count, target_fpr, hash_count, max_set, block_bits=None,
+                start=1):
+    """
+        (int) returns smallest length (multiple of block_bits for blocked
+              filters) for which the filter with hash_count functions keeps
+              false positive rate at or below target_fpr. The search starts
+              at start bits, a close guess saves evaluating the (slow)
+              blocked rate of far too short filters.
+    """
+    unit = block_bits or 1
+
+    def too_high(units):
+        return _fpr(count, units * unit, hash_count, max_set,
+                    block_bits) > target_fpr
+
+    high = max(1, -(-start // unit))
+    if too_high(high):
+        while too_high(high):
+            high *= 2
+        low = high // 2
+    else:
+        low = high // 2
+        while low and not too_high(low):
+            high, low = low, low // 2
+    while high - low > 1:
+        middle = (low + high) // 2
+        if too_high(middle):
+            low = middle
+        else:
+            high = middle
+    return high * unit
+
+
+def _blocked_optimum(count, target_fpr, max_set, block_bits, hash_count,
+                     max_hashes, length):
+    """
+        ((int, int)) returns smallest blocked length and its hash count.
+        Starts at hash_count, the optimum of a classic filter of length
+        bits, and walks to fewer and then more functions while the length
+        keeps falling. length is the first guess of every search.
+    """
+    def blocked(k):
+        return (_min_length(count, target_fpr, k, max_set, block_bits,
+                            length), k)
+
+    best = blocked(hash_count)
+    for step in (-1, 1):
+        k = hash_count + step
+        while 1 <= k <= max_hashes:
+            candidate = blocked(k)
+            if candidate[0] > best[0]:
+                break
+            best = min(best, candidate)
+            k += step
+    return best
+
+
+def _set_bits(mask, limit=None):
+    """
+        ([int]) returns indices of set bits of mask in ascending order
+        _set_bits(
+            mask => non-negative int
+            limit => return at most this many indices, by default all
+        )
+    """
+    indices = []
+    while mask and len(indices) != limit:
+        lowest = mask & -mask
+        indices.append(lowest.bit_length() - 1)
+        mask ^= lowest
+    return indices
+
+
+def encode_key(item):
+    """
+        (bytes-like) returns the bytes hashed for item, computed once per
+        operation:
+            - str => UTF-8 encoding
+            - bytes, bytearray => item itself
+            - int => INT_TAG followed by minimal signed little-endian
+                     two's complement, 0 is b"\xff\x00", -1 is
+                     b"\xff\xff", 128 is b"\xff\x80\x00"
+            - memoryview or other buffer => its bytes, C-contiguous
+                                            buffers are not copied
+        str and bytes keys with the same bytes ("a" and b"a") are the same
+        key. INT_TAG never occurs in UTF-8, so int keys never collide with
+        str keys, nor with bytes keys unless those start with INT_TAG.
+        encode_key(
+            item => key to encode
+        )
+    """
+    if isinstance(item, str):
+        return item.encode()
+    if isinstance(item, (bytes, bytearray)):
+        return item
+    if isinstance(item, int):
+        size = ((item if item >= 0 else ~item).bit_length() + 8) // 8
+        return INT_TAG + item.to_bytes(size, "little", signed=True)
+    try:
+        view = memoryview(item)
+    except TypeError:
+        raise TypeError("Keys have to be str, int or bytes-like, not %s."
+                        % type(item).__name__) from None
+    if not view.c_contiguous:
+        return view.tobytes()
+    if view.format != "B" or view.ndim != 1:
+        return view.cast("B")
+    return view
+
+
+def _int_digest(hash_fn, data):
+    """(int) returns hashlib style digest of data as an int"""
+    return int.from_bytes(hash_fn(data).digest(), byteorder)
+
+
+def int_digester(hash_fn):
+    """
+        (callable) returns function mapping encoded data to an int digest,
+                   hash functions with an intdigest method are used directly.
+        int_digester(
+            hash_fn => hash function
+        )
+    """
+    try:
+        return _DEFAULT_DIGESTERS[hash_fn]
+    except (KeyError, TypeError):
+        pass
+    intdigest = getattr(hash_fn, "intdigest", None)
+    if intdigest is not None:
+        return intdigest
+    return partial(_int_digest, hash_fn)
+
+
+# digesters of DEFAULT_HASHES, shared by all filters using them
+_DEFAULT_DIGESTERS = {fn: partial(_int_digest, fn) for fn in DEFAULT_HASHES}
+
 
 class ShiftingBloomFilter:
     """
@@ -23,20 +266,31 @@ class ShiftingBloomFilter:
 
     def __init__(self, length, hash_source=algorithms_guaranteed,
                  hash_count=None, length_as_power=True, mode=MULTIPLE,
-                 set_count=0):
+                 set_count=0, max_count=None, block_bits=None):
         """
         ShiftingBlomFilter(
-            length => the size of the underlying bytearray which is used to
-                                                    represent the filter.
+            length => the number of bits in the underlying bit array which
+                      is used to represent the filter.
             hash_count => amount of hashing functions to use.
                           NOTE: cannot be greater than length
                                                     of hash source
-            hash_source => a list of hashing functions to use
+            hash_source => a list of hashing functions to use or FAST_HASH
+                           for a family of hash_count seeded xxh64 functions
             length_as_power => is the length of the filter expressed
                                 as power of 2 (True) or is it literal (False)
             mode => MULTIPLE if there are multiple sets or MULTISET if its one
                     set but supporting multiple elements.
             set_count => how many sets is this filter supposed to support?
+            max_count => for multisets, highest multiplicity to record,
+                         further inserts of the item are ignored. By
+                         default multiplicity is not capped.
+            block_bits => use blocked layout, all positions of an item
+                          (shifted ones included) fall into one block of
+                          block_bits bits, chosen by a single block hash.
+                          CACHE_LINE_BITS makes every probe of an item hit
+                          the same cache line. Length has to be a multiple
+                          of block_bits. Offsets wrap around within the
+                          block, so max_set should stay below block_bits.
         )
 
         ** NOTE: every hashing function must have a digest function that takes
@@ -45,65 +299,227 @@ class ShiftingBloomFilter:
                  they require a parameter in the digest function
         **
 
+        Items can be str, bytes-like objects or ints, see encode_key.
+
         public methods:
         - insert(item, set_no) => insert item into filter with set_no
         - check(item) => check if item is in the filter
+        - insert_many(items, set_nos) => insert every item into the filter
+        - check_many(items) => check every item, returns list of results
         - save2file(filename) => save filter to file
         - (static) load_from_file(filename) => load filter from file
+        - save_binary(filename) => save filter to versioned binary file
+        - (class) load_binary(filename) => load filter from binary file
+        - (class) open_mmap(filename, readonly) => memory map binary file
+        - flush() => write header of writable memory mapped filter
+        - close() => close memory mapped filter
+        - merge(other) => add all items of other compatible filter
+        - intersect(other) => keep only items also in other compatible filter
+        - (class) for_capacity(n, target_fpr, set_count, mode) => create
+                  smallest filter keeping target_fpr for n items
+        - enable_stats(sink, every, slow_scan) => start recording counters
+                                                 of the hot paths
+        - disable_stats() => stop recording counters
+        - stats() => counters, fill ratio and estimated fpr as a dict
+        - fill_ratio() => share of set bits
+        - get_fpr(from_fill) => estimated false positive rate
+
+        bit_count is the number of set bits (non-zero counters), kept up
+        to date as bits are set. Loaded filters count their bits the first
+        time bit_count is read, so loading does not scan the bits.
         """
         self.m = 2**length if length_as_power else length
-        self.hashfunc = (
-            [getattr(hashlib, name) for name in algorithms_guaranteed
-             if "shake" not in name.lower()]
-            if hash_source is algorithms_guaranteed else hash_source
-        )
+        if block_bits is not None and (block_bits <= 0
+                                       or self.m % block_bits):
+            raise ValueError("Length has to be a multiple of block_bits.")
+        self.block_bits = block_bits
+        self.hashfunc = (DEFAULT_HASHES if hash_source is algorithms_guaranteed
+                         else hash_source)
+        if hash_source == FAST_HASH:
+            self.hashfunc = FastHashFamily(
+                DEFAULT_HASH_COUNT if hash_count is None else hash_count
+            )
         if hash_count is None:
             hash_count = len(self.hashfunc)
-        if hash_count > len(hash_source):
+        if hash_count > len(self.hashfunc):
             raise HashesUnavailableError(ERROR_MSGS.NOT_ENNOUGH_HASHES)
         self.k = hash_count
         self.cut_off = self.k//2
         self.hashfunc = self.hashfunc[:self.k]
-        self.filter = bytearray(self.m)
+        self._init_hashing()
+        self.filter = self._new_storage()
         self.max_set = set_count
         self.length_as_power = length_as_power
         self.hash_source = hash_source
         self.mode = mode
+        self.max_count = max_count
         self.count = 0
+        self._bit_count = 0
+        self._stats = None
 
     def __len__(self):
-        """(int) returns the length of the underlying bytearray"""
+        """(int) returns the length of the underlying bit array"""
         return self.m
 
     def __bool__(self):
         """(boolean) returns if the filter is not empty"""
-        for i in self.filter:
-            if i:
-                return True
-        return False
+        return self.bit_count > 0
+
+    def fill_ratio(self):
+        """(Number) returns share of set bits (non-zero counters)"""
+        return self.bit_count / self.m
+
+    @property
+    def bit_count(self):
+        """(int) number of set bits, counted on first use if not known"""
+        if self._bit_count is None:
+            self._bit_count = self.filter.popcount()
+        return self._bit_count
+
+    @bit_count.setter
+    def bit_count(self, value):
+        """sets number of set bits, None recounts them on next use"""
+        self._bit_count = value
+
+    def _recount(self):
+        """(void) recounts set bits after the storage changed as a whole"""
+        self._bit_count = None
+
+    def _count_bits(self, newly):
+        """(void) adds newly set bits to bit_count, unless not counted yet"""
+        if self._bit_count is not None:
+            self._bit_count += newly
+
+    def _new_storage(self):
+        """(BitArray) returns empty storage for the bits of the filter"""
+        return BitArray(self.m)
+
+    def _init_hashing(self):
+        """
+            (void) splits hash functions into base and offset functions and
+                   prepares int digesters for them.
+        """
+        self._base_fns = self.hashfunc[:self.cut_off]
+        self._offset_fns = self.hashfunc[self.cut_off:]
+        self._base_digesters = [int_digester(fn) for fn in self._base_fns]
+        self._offset_digesters = [int_digester(fn) for fn in self._offset_fns]
+
+    def __getstate__(self):
+        """returns state for pickling, without derived hashing state"""
+        state = self.__dict__.copy()
+        for name in _DERIVED_STATE:
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        """restores pickled filter, upgrading one byte per bit storage"""
+        self.__dict__.update(state)
+        self.__dict__.setdefault("max_count", None)
+        self.__dict__.setdefault("block_bits", None)
+        self.__dict__.setdefault("_stats", None)
+        if isinstance(self.filter, bytearray):
+            bits = BitArray(self.m)
+            for index, value in enumerate(self.filter):
+                if value:
+                    bits.set(index)
+            self.filter = bits
+        # bits of filters without a known count are counted on first use
+        self.__dict__.setdefault("_bit_count",
+                                 self.__dict__.pop("bit_count", None))
+        self._init_hashing()
 
     def __str__(self):
         """return string representation of the filter"""
-        str_ = ""
-        for i in self.filter:
-            str_ += " " + str(i)
-        str_ += " "
+        str_ = " %s " % " ".join(
+            str(i) for i in islice(self.filter, STR_LIMIT)
+        )
+        if self.m > STR_LIMIT:
+            str_ += "... (%s more) " % (self.m - STR_LIMIT)
         return str_
 
     def __repr__(self):
         """return string representation of an object constructor"""
+        hash_source = str(self.hash_source)
+        if len(hash_source) > REPR_LIMIT:
+            hash_source = reprlib.repr(self.hash_source)
         return "ShiftingBloomFilter(%s, %s, %s, %s, %s, %s)" % (
             self.m if not self.length_as_power else int(math.log2(self.m)),
-            self.hash_source,
+            hash_source,
             self.k,
             self.length_as_power,
             self.mode,
             self.max_set
         )
 
+    def _check_compatible(self, other):
+        """
+            (void) raises IncompatibleFiltersError unless other has the same
+                   length, hash functions, mode, blocks and kind of storage.
+        """
+        if (not isinstance(other, ShiftingBloomFilter) or self.m != other.m
+                or self.k != other.k or self.mode != other.mode
+                or self.block_bits != other.block_bits
+                or type(self.filter) is not type(other.filter)
+                or list(self.hashfunc) != list(other.hashfunc)):
+            raise IncompatibleFiltersError(ERROR_MSGS.INCOMPATIBLE_FILTERS)
+
+    def merge(self, other):
+        """
+            (void) adds all items of other filter to this one by or-ing the
+                   bit arrays word-wise. count becomes the sum of counts and
+                   max_set the higher of both.
+            merge(
+                other => filter with the same length, hash functions and mode
+            )
+        """
+        self._check_compatible(other)
+        self.filter.union_update(other.filter)
+        self._recount()
+        self.count += other.count
+        self.max_set = max(self.max_set, other.max_set)
+
+    def intersect(self, other):
+        """
+            (void) keeps only bits set in both filters, by and-ing the bit
+                   arrays word-wise. count becomes the lower of counts and
+                   max_set the lower of both, as these bound the intersection.
+            intersect(
+                other => filter with the same length, hash functions and mode
+            )
+        """
+        self._check_compatible(other)
+        self.filter.intersection_update(other.filter)
+        self._recount()
+        self.count = min(self.count, other.count)
+        self.max_set = min(self.max_set, other.max_set)
+
+    def __or__(self, other):
+        """(ShiftingBloomFilter) union of two compatible filters"""
+        self._check_compatible(other)
+        union = copy.deepcopy(self)
+        union.merge(other)
+        return union
+
+    def __and__(self, other):
+        """(ShiftingBloomFilter) intersection of two compatible filters"""
+        self._check_compatible(other)
+        intersection = copy.deepcopy(self)
+        intersection.intersect(other)
+        return intersection
+
+    def __ior__(self, other):
+        """(ShiftingBloomFilter) merges other filter into this one"""
+        self.merge(other)
+        return self
+
+    def __iand__(self, other):
+        """(ShiftingBloomFilter) intersects this filter with other one"""
+        self.intersect(other)
+        return self
+
     def __getitem__(self, index):
         """
-            (int) [index] => returns index position of the underlying bytearray
+            (int) [index] => returns bit at index position of the filter
         """
         return self.filter[index]
 
@@ -117,8 +533,62 @@ class ShiftingBloomFilter:
             )
         """
 
-        hashed_value = hash_fn(data.encode()).digest()
-        return (int.from_bytes(hashed_value, byteorder) + offset) % self.m
+        values = self._hash_values(encode_key(data), [int_digester(hash_fn)])
+        return self._shift(values[0], offset)
+
+    def _block_of(self, data):
+        """
+        (int or None) returns first position of the block chosen for data by
+                      the block hash, None if the filter is not blocked.
+            _block_of(
+                data => encoded object to be hashed
+            )
+        """
+        block_bits = self.block_bits
+        if not block_bits:
+            return None
+        return xxh64(data, BLOCK_SEED) % (self.m // block_bits) * block_bits
+
+    def _hash_values(self, data, digesters, block=None):
+        """
+        ([int]) returns positions of data for every digester, each key is
+                hashed once per hash function. Digests are reduced modulo
+                length of the filter, or for blocked filters modulo
+                block_bits within the block chosen by the block hash.
+            _hash_values(
+                data => encoded object to be hashed
+                digesters => int digesters of the hash functions to use
+                block => block of data returned by _block_of, computed if
+                         not given
+            )
+        """
+        stats = self._stats
+        if stats is not None:
+            started = stats.clock()
+        block_bits = self.block_bits
+        if block_bits:
+            if block is None:
+                block = self._block_of(data)
+            values = [block + digest(data) % block_bits
+                      for digest in digesters]
+        else:
+            m = self.m
+            values = [digest(data) % m for digest in digesters]
+        if stats is not None:
+            stats.hashed(len(digesters), started)
+        return values
+
+    def _shift(self, value, offset):
+        """
+        (int) returns position value shifted by offset, wrapping around the
+              filter, or around the block for blocked filters.
+            _shift(
+                value => position returned by _hash_values
+                offset => offset to shift by
+            )
+        """
+        span = self.block_bits or self.m
+        return value - value % span + (value + offset) % span
 
     def _set_position(self, hash_fn, item, set_no=0):
         """
@@ -131,7 +601,8 @@ class ShiftingBloomFilter:
                 set_no => this is the id of the set, by default 0
             )
         """
-        self.filter[self._get_hash(hash_fn, item, set_no)] = 1
+        if self.filter.set(self._get_hash(hash_fn, item, set_no)):
+            self._count_bits(1)
 
     def _check_position(self, hash_fn, item, set_no=0):
         """
@@ -143,7 +614,7 @@ class ShiftingBloomFilter:
                 set_no => set id that object shoud belong to, by default 0
             )
         """
-        return self.filter[self._get_hash(hash_fn, item, set_no)] == 1
+        return self.filter.test(self._get_hash(hash_fn, item, set_no))
 
     def insert(self, item, set_no=0):
         """
@@ -154,16 +625,42 @@ class ShiftingBloomFilter:
                           if working with multiple sets.
             )
         """
+        if self._stats is not None:
+            self._stats.operation("inserts")
         if self.mode:
             self._insert_at_offset(item, set_no)
-        else:
-            in_set, count = self.check(item)
-            if in_set:
-                self._insert_at_offset(item, count+1)
-            else:
-                self._insert_at_offset(item, 0)
+        elif not self._insert_multiset(item):
+            return
         self.count += 1
 
+    def _insert_multiset(self, item, data=None):
+        """
+            (boolean) inserts another copy of item to multiset in a single
+                      pass, the key is hashed once, its multiplicity is read
+                      from the same positions that are then set. Returns
+                      False if the multiplicity already reached max_count.
+            _insert_multiset(
+                item => item to insert
+                data => item already encoded by encode_key, by default
+                        item is encoded here
+            )
+        """
+        if data is None:
+            data = encode_key(item)
+        block = self._block_of(data)
+        base = self._hash_values(data, self._base_digesters, block)
+        values = self._hash_values(data, self._offset_digesters, block)
+        test = self.filter.test
+        count = 0
+        if all(test(value) for value in base):
+            count = len(self._matching_offsets(values, self.max_count))
+            if self._stats is not None:
+                self._stats.key(item)
+        if self.max_count is not None and count >= self.max_count:
+            return False
+        self._set_positions(base, values, count + 1 if count else 0)
+        return True
+
     def _insert_at_offset(self, item, offset):
         """
             (void) inserts item with 'offset' as an offset
@@ -172,12 +669,34 @@ class ShiftingBloomFilter:
                 offset => offset to use while hashing
             )
         """
+        data = encode_key(item)
+        block = self._block_of(data)
+        self._set_positions(
+            self._hash_values(data, self._base_digesters, block),
+            self._hash_values(data, self._offset_digesters, block),
+            offset
+        )
+
+    def _set_positions(self, base, values, offset):
+        """
+            (void) sets base positions and offset positions shifted by offset
+            _set_positions(
+                base => digests of the item for the base hash functions
+                values => digests of the item for the offset hash functions
+                offset => offset to shift values by
+            )
+        """
         if offset > self.max_set:
             self.max_set = offset
-        for hash_fn in self.hashfunc[:self.cut_off]:
-            self._set_position(hash_fn, item)
-        for hash_fn in self.hashfunc[self.cut_off:]:
-            self._set_position(hash_fn, item, offset)
+        bits = self.filter
+        newly = 0
+        for value in base:
+            newly += bits.set(value)
+        for value in values:
+            newly += bits.set(self._shift(value, offset))
+        self._count_bits(newly)
+        if self._stats is not None:
+            self._stats.bits(newly, len(base) + len(values))
 
     def check(self, item):
         """
@@ -189,50 +708,310 @@ class ShiftingBloomFilter:
             )
         """
 
-        for hash_fn in self.hashfunc[:self.cut_off]:
-            if not self._check_position(hash_fn, item):
+        data = encode_key(item)
+        m = self.m
+        test = self.filter.test
+        stats = self._stats
+        if stats is not None:
+            stats.operation("checks")
+        block = self._block_of(data)
+        if block is not None or stats is not None:
+            hit = all(test(value) for value in
+                      self._hash_values(data, self._base_digesters, block))
+        else:
+            hit = all(test(digest(data) % m)
+                      for digest in self._base_digesters)
+        if not hit:
+            if self.mode:
+                return False, []
+            return False, 0
+        result = self._check_offsets(
+            self._hash_values(data, self._offset_digesters, block)
+        )
+        if stats is not None:
+            stats.key(item)
+        return result
+
+    def _hash_matrix(self, datas, digesters, blocks):
+        """
+        (numpy array) returns digests of every encoded item (rows) for every
+                      hash function (columns).
+            _hash_matrix(
+                datas => encoded objects to be hashed
+                digesters => int digesters of the hash functions to use
+                blocks => block of every item returned by _block_of
+            )
+        """
+        numpy = _numpy()
+        return numpy.array(
+            [self._hash_values(data, digesters, block)
+             for data, block in zip(datas, blocks)],
+            dtype=numpy.int64
+        ).reshape(len(datas), len(digesters))
+
+    def _shift_matrix(self, values, offsets):
+        """
+        (numpy array) returns positions values shifted by broadcast offsets,
+                      as _shift does for single positions.
+        """
+        span = self.block_bits or self.m
+        return values - values % span + (values + offsets) % span
+
+    def insert_many(self, items, set_nos=0):
+        """
+            (void) inserts every item to bloom filter, in MULTIPLE mode
+                   all positions are set with a single numpy operation.
+            insert_many(
+                items => iterable of items to insert
+                set_nos => set id for all items or an iterable with set id
+                           for every item, by default 0. Ignored for
+                           multisets.
+            )
+        """
+        items = list(items)
+        if isinstance(set_nos, int):
+            set_nos = [set_nos] * len(items)
+        else:
+            set_nos = list(set_nos)
+            if len(set_nos) != len(items):
+                raise ValueError("set_nos has to match items in length.")
+        numpy = _numpy()
+        if numpy is None or not self.mode or not items:
+            for item, set_no in zip(items, set_nos):
+                self.insert(item, set_no)
+            return
+        datas = [encode_key(item) for item in items]
+        blocks = [self._block_of(data) for data in datas]
+        offsets = numpy.array(set_nos, dtype=numpy.int64)
+        shifted = self._shift_matrix(
+            self._hash_matrix(datas, self._offset_digesters, blocks),
+            offsets[:, None]
+        )
+        positions = numpy.concatenate((
+            self._hash_matrix(datas, self._base_digesters, blocks).ravel(),
+            shifted.ravel()
+        ))
+        newly = len(numpy.unique(
+            positions[~self.filter.test_many(positions)]
+        ))
+        if self._stats is not None:
+            self._stats.operation("inserts", len(items))
+            self._stats.bits(newly, len(positions))
+        self.filter.set_many(positions)
+        self._count_bits(newly)
+        self.max_set = max(self.max_set, int(offsets.max()))
+        self.count += len(items)
+
+    def check_many(self, items):
+        """
+            ([(boolean, list of set ids)]) or ([(boolean, count)])
+            checks every item, results are in the same order and shape as
+            returned by check. Bits are gathered with numpy fancy indexing.
+            check_many(
+                items => iterable of items to check for
+            )
+        """
+        items = list(items)
+        numpy = _numpy()
+        if numpy is None:
+            return [self.check(item) for item in items]
+        if self._stats is not None:
+            self._stats.operation("checks", len(items))
+        miss = (False, []) if self.mode else (False, 0)
+        results = [miss] * len(items)
+        shifts = numpy.arange(self.max_set + 1, dtype=numpy.int64)
+        step = max(1, BATCH_POSITIONS // (self.k * len(shifts)))
+        for start in range(0, len(items), step):
+            datas = [encode_key(item) for item in items[start:start + step]]
+            blocks = [self._block_of(data) for data in datas]
+            base = self._hash_matrix(datas, self._base_digesters, blocks)
+            hits = numpy.flatnonzero(self.filter.test_many(base).all(axis=1))
+            if not len(hits):
+                continue
+            if self._stats is not None:
+                self._stats.scanned(len(shifts), len(hits))
+            values = self._hash_matrix([datas[i] for i in hits],
+                                       self._offset_digesters,
+                                       [blocks[i] for i in hits])
+            matches = self.filter.test_many(
+                self._shift_matrix(values[:, :, None], shifts)
+            ).all(axis=1)
+            for i, row in zip(hits.tolist(), matches):
+                possible_sets = numpy.flatnonzero(row).tolist()
                 if self.mode:
-                    return False, []
-                return False, 0
-        return self._check_offsets(item)
+                    results[start + i] = (len(possible_sets) > 0,
+                                          possible_sets)
+                    continue
+                count = len(possible_sets)
+                if self.max_count is not None:
+                    count = min(count, self.max_count)
+                results[start + i] = (count > 0, count)
+        return results
 
-    def _check_offsets(self, item):
+    def _check_offsets(self, values):
         """
             (boolean, list of set ids that item might possibly be in) or
             (boolean, possible count of items in the set)
             checks the sets that item might be in.
             _check_offsets(
-                item => item to check for.
+                values => digests of the item for the offset hash functions.
             )
         """
 
-        set_no = 0
+        if self.mode:
+            possible_sets = self._matching_offsets(values)
+            return (len(possible_sets) > 0, possible_sets)
+        count = len(self._matching_offsets(values, self.max_count))
+        return (count > 0, count)
+
+    def _matching_offsets(self, values, limit=None):
+        """
+            ([int]) returns offsets up to max_set at which all shifted
+                    positions are set. When max_set + 1 is above
+                    PROBE_WIDTH bit arrays read the shifted positions of
+                    every function as one window and and the windows,
+                    otherwise positions are probed offset by offset.
+            _matching_offsets(
+                values => digests of the item for the offset hash functions.
+                limit => stop scanning after this many matches, by default
+                         all offsets are scanned.
+            )
+        """
+        span = self.block_bits or self.m
+        width = self.max_set + 1
+        get_window = getattr(self.filter, "get_window", None)
+        if get_window is not None and width > PROBE_WIDTH:
+            mask = (1 << width) - 1
+            for value in values:
+                mask &= get_window(value, width, value - value % span, span)
+                if not mask:
+                    break
+            if self._stats is not None:
+                self._stats.scanned(width)
+            return _set_bits(mask, limit)
+        test = self.filter.test
+        starts = [(value - value % span, value % span) for value in values]
         possible_sets = []
-        while self.max_set >= set_no:
-            for hash_fn in self.hashfunc[self.cut_off:]:
-                if not self._check_position(hash_fn, item, set_no):
+        for set_no in range(width):
+            for start, value in starts:
+                if not test(start + (value + set_no) % span):
                     break
             else:
                 possible_sets.append(set_no)
-            set_no += 1
-        if self.mode:
-            return (len(possible_sets) > 0, possible_sets)
-        return (len(possible_sets) > 0, len(possible_sets))
+                if len(possible_sets) == limit:
+                    break
+        if self._stats is not None:
+            self._stats.scanned(set_no + 1)
+        return possible_sets
 
     def save2file(self, filename="sbf.bin"):
         """(void) save filter to a binary file"""
 
+        import pickle
         with open(filename, "wb") as datafile:
             pickle.dump(self, datafile)
 
-    def get_fpr(self):
+    def get_fpr(self, from_fill=False):
         """
             (Number) returns false positve rate for current state
             of the filter
+            get_fpr(
+                from_fill => estimate from the share of set bits instead of
+                             the number of inserted items, this also holds
+                             after merges and for skewed data. For blocked
+                             filters fill varies between blocks, so the
+                             estimate is a lower bound.
+            )
+        """
+        if from_fill:
+            return fill_fpr(self.fill_ratio(), self.k, self.max_set)
+        return _fpr(self.count, len(self), self.k, self.max_set,
+                    self.block_bits)
+
+    def enable_stats(self, sink=None, every=10000, slow_scan=100):
+        """
+            (instrumentation.FilterStats) starts recording counters of
+            hashing, offset scans and set bits, returns the counters.
+            While enabled, check hashes all base functions up front.
+            enable_stats(
+                sink => function called with stats() every every inserted
+                        or checked items, by default counters are only read
+                        with stats()
+                every => number of items between calls of sink
+                slow_scan => checks and multiset inserts probing at least
+                             this many offsets record their key
+            )
+        """
+        self._stats = FilterStats(self.stats, sink, every, slow_scan)
+        return self._stats
+
+    def disable_stats(self):
+        """(void) stops recording counters, hot paths are not instrumented"""
+        self._stats = None
+
+    def stats(self):
+        """
+            (dict) returns fill ratio (share of set positions), estimated
+            false positive rates (from count and from fill ratio), count
+            and max_set of the filter, with all
+            counters of instrumentation.FilterStats when stats are enabled.
+        """
+        stats = {
+            "count": self.count,
+            "max_set": self.max_set,
+            "fill_ratio": self.fill_ratio(),
+            "estimated_fpr": self.get_fpr(),
+            "fill_fpr": self.get_fpr(from_fill=True),
+        }
+        if self._stats is not None:
+            stats.update(self._stats.counters())
+        return stats
+
+    @classmethod
+    def for_capacity(cls, n, target_fpr, set_count=0, mode=MULTIPLE,
+                     hash_source=CAPACITY_HASH_SOURCE,
+                     length_as_power=False, block_bits=None):
         """
-        p = math.e ** ((-self.count * self.k)/len(self))
-        fpr = ((1-p)**(self.k/2)) * (1 - p + (1/(self.max_set+1)) * (p**2))
-        return fpr
+            (class) (ShiftingBloomFilter)
+            creates the smallest filter that keeps false positive rate at or
+            below target_fpr after n insertions, with optimal hash count.
+            for_capacity(
+                n => expected number of insertions
+                target_fpr => desired false positive rate, 0 < target_fpr < 1
+                set_count => how many sets is this filter supposed to support?
+                mode => MULTIPLE or MULTISET
+                hash_source => FAST_HASH, name of a hashlib function to
+                               build salted utils.HashFactory from, or a
+                               list of hashing functions to choose from.
+                               By default FAST_HASH when xxhash is
+                               installed, otherwise "sha256".
+                length_as_power => round length up to a power of 2
+                block_bits => size of blocks of a blocked filter, None for
+                              a classic filter, length is a multiple of it.
+            )
+        """
+        if n <= 0 or not 0 < target_fpr < 1:
+            raise ValueError("n has to be positive and 0 < target_fpr < 1.")
+        if hash_source == FAST_HASH or isinstance(hash_source, str):
+            max_hashes = MAX_HASH_COUNT
+        else:
+            max_hashes = min(MAX_HASH_COUNT, len(hash_source))
+        length, hash_count = min(
+            (_min_length(n, target_fpr, k, set_count), k)
+            for k in range(1, max_hashes + 1)
+        )
+        if block_bits is not None:
+            length, hash_count = _blocked_optimum(n, target_fpr, set_count,
+                                                  block_bits, hash_count,
+                                                  max_hashes, length)
+        if isinstance(hash_source, str) and hash_source != FAST_HASH:
+            from .utils import HashFactory
+            hash_source = HashFactory(hash_source, hash_count)
+        if length_as_power:
+            length = (length - 1).bit_length()
+        return cls(length, hash_source=hash_source, hash_count=hash_count,
+                   length_as_power=length_as_power, mode=mode,
+                   set_count=set_count, block_bits=block_bits)
 
     @staticmethod
     def load_from_file(filename="sbf.bin"):
@@ -240,5 +1019,73 @@ class ShiftingBloomFilter:
             (static) (ShiftingBloomFilter)
             restore a filter from binary file.
         """
+        import pickle
         with open(filename, "rb") as sbf:
             return pickle.load(sbf)
+
+    def save_binary(self, filename="sbf.sbf"):
+        """
+            (void) save filter to a versioned binary file, which unlike
+                   save2file does not pickle the object.
+            save_binary(
+                filename => name of the file
+            )
+        """
+        from . import file_format
+        file_format.write_filter(self, filename)
+
+    @classmethod
+    def load_binary(cls, filename="sbf.sbf"):
+        """
+            (class) (ShiftingBloomFilter)
+            restore a filter from file written by save_binary.
+        """
+        from . import file_format
+        return file_format.read_filter(cls, filename)
+
+    @classmethod
+    def open_mmap(cls, filename="sbf.sbf", readonly=True):
+        """
+            (class) (ShiftingBloomFilter)
+            memory map a file written by save_binary, bits are served from
+            the page cache without being copied.
+            open_mmap(
+                filename => name of the file
+                readonly => map read-only (default), otherwise inserts are
+                            written to the file, call flush or close to
+                            update its header.
+            )
+        """
+        from . import file_format
+        return file_format.open_filter(cls, filename, readonly)
+
+    def flush(self):
+        """
+            (void) write count and max_set of a writable memory mapped
+                   filter back to its file.
+        """
+        mapping = getattr(self, "_mapping", None)
+        if mapping is not None and not mapping.closed and self._writable():
+            from . import file_format
+            file_format.sync_header(self)
+
+    def _writable(self):
+        """(boolean) returns if bits of the filter can be modified"""
+        return not getattr(self.filter.data, "readonly", False)
+
+    def close(self):
+        """(void) flush and close memory mapped filter"""
+        mapping = getattr(self, "_mapping", None)
+        if mapping is None or mapping.closed:
+            return
+        self.flush()
+        self.filter.data.release()
+        mapping.close()
+
+    def __enter__(self):
+        """returns the filter for use in with statement"""
+        return self
+
+    def __exit__(self, *args):
+        """closes memory mapped filter at the end of with statement"""
+        self.close()
@@ -2,19 +2,28 @@
 """
 Set of utilities that can be used with ShiftingBloomFilter:
     - CSVDataSet => a reader for data sets stored as CSV files
+    - ChunkedDataSet => a streaming reader of large (optionally gzipped)
+                        CSV or line files yielding batches of keys, used
+                        to bulk load filters with bounded memory
     - RandomStringGenerator => object used for generating random strings
     - HashFactory => object used for producing a list of salted hash functions
+                     or seeded fast hash functions
     - HashFunction => a salted hash function.
+    - PrefixHashFunction => a hash function salted with a prefix, hashing
+                            from a precomputed state.
 """
 #"It takes courage to choose hope over fear."
 #   ~Mark Zuckerberg
 
 
-from random import randint
+from random import randint, getrandbits
 from hashlib import algorithms_guaranteed
+import gzip
 import hashlib
 import pickle
+from sys import byteorder
 from .exceptions import ERROR_MSGS, HashesUnavailableError
+from .fast_hash import FAST_HASH, FastHashFunction
 
 class HashFunction:
     """
@@ -25,19 +34,100 @@ class HashFunction:
         """
             HashFunction(
                 hash_base => hash function to use for base,
-                salt => salt to use for hashing.
+                salt => salt to use for hashing (str or bytes).
             )
         """
         self.hash_base = hash_base
-        self.salt = salt.encode()
+        self.salt = salt.encode() if isinstance(salt, str) else bytes(salt)
 
     def __repr__(self):
         """return string representation of a salted hash function"""
         return "HashFunction(%s,%s)" % (repr(self.hash_base), str(self.salt))
 
+    def __eq__(self, other):
+        """
+            (boolean) functions are equal if they salt the same way with
+                      the same base and salt
+        """
+        if not isinstance(other, HashFunction):
+            return NotImplemented
+        return (type(self) is type(other) and self.hash_base == other.hash_base
+                and self.salt == other.salt)
+
+    def __hash__(self):
+        """(int) hash of the salted function"""
+        return hash((type(self), self.hash_base, self.salt))
+
     def __call__(self, data):
-        """Return hash for data"""
-        return self.hash_base(data + self.salt)
+        """
+            Return hash for data followed by salt, data is fed to the hash
+            as it is instead of being concatenated with the salt.
+        """
+        hashed = self.hash_base(data)
+        hashed.update(self.salt)
+        return hashed
+
+    def intdigest(self, data):
+        """(int) returns digest of data as an int in native byte order"""
+        hashed = self.hash_base(data)
+        hashed.update(self.salt)
+        return int.from_bytes(hashed.digest(), byteorder)
+
+
+class PrefixHashFunction(HashFunction):
+    """
+        Hash function salted with a prefix. The salt is fed to the hash
+        once, every call copies that state and feeds only the data. blake2
+        functions take the salt as their native salt parameter instead,
+        when it fits. Digests differ from those of HashFunction.
+    """
+
+    def __init__(self, hash_base, salt):
+        """
+            PrefixHashFunction(
+                hash_base => hash function to use for base,
+                salt => salt to use for hashing (str or bytes).
+            )
+        """
+        super().__init__(hash_base, salt)
+        self._init_state()
+
+    def _init_state(self):
+        """(void) creates hash state the salt was already fed to"""
+        salt_size = getattr(self.hash_base, "SALT_SIZE", None)
+        if (self.hash_base in (hashlib.blake2b, hashlib.blake2s)
+                and len(self.salt) <= salt_size):
+            self._state = self.hash_base(salt=self.salt)
+        else:
+            self._state = self.hash_base(self.salt)
+
+    def __getstate__(self):
+        """returns state for pickling, hash state is recreated"""
+        state = self.__dict__.copy()
+        del state["_state"]
+        return state
+
+    def __setstate__(self, state):
+        """restores pickled function and its hash state"""
+        self.__dict__.update(state)
+        self._init_state()
+
+    def __repr__(self):
+        """return string representation of a salted hash function"""
+        return "PrefixHashFunction(%s,%s)" % (repr(self.hash_base),
+                                              str(self.salt))
+
+    def __call__(self, data):
+        """Return hash for salt followed by data"""
+        hashed = self._state.copy()
+        hashed.update(data)
+        return hashed
+
+    def intdigest(self, data):
+        """(int) returns digest of data as an int in native byte order"""
+        hashed = self._state.copy()
+        hashed.update(data)
+        return int.from_bytes(hashed.digest(), byteorder)
 
 
 class HashFactory:
@@ -47,14 +137,19 @@ class HashFactory:
         with ShiftingBloomFilter.
     """
 
-    def __init__(self, hash_family, hash_count):
+    def __init__(self, hash_family, hash_count, prefix=False):
         """
             HashFactory(
-                hash_family => a base for hash functions from hashlib
+                hash_family => a base for hash functions from hashlib or
+                               FAST_HASH for seeded xxh64 functions
                 hash_count  => number of hash functions to generate
+                prefix => salt as a prefix with PrefixHashFunction, hashing
+                          from precomputed salted states, instead of
+                          appending the salt with HashFunction.
             )
 
             Public methods:
+            - hash_all(data) => digests of data for every function
             - save2file(filename) => save to file
             - (static) load_from_file(filename) => load from file
 
@@ -64,11 +159,14 @@ class HashFactory:
             - iterating over.
         """
 
-        if hash_family not in algorithms_guaranteed:
+        if (hash_family not in algorithms_guaranteed
+                and hash_family != FAST_HASH):
             raise HashesUnavailableError(ERROR_MSGS.HASH_FUNCTION_UNAVAILABLE)
         self.hash_family = hash_family
-        self.hash_base = getattr(hashlib, hash_family)
+        self.hash_base = (None if hash_family == FAST_HASH
+                          else getattr(hashlib, hash_family))
         self.hash_count = hash_count
+        self.prefix = prefix
         self.salts = []
         self.hash_funcs = []
         self.index = -1
@@ -81,11 +179,29 @@ class HashFactory:
 
     def __repr__(self):
         """returns an representation of HashFactory object"""
+        if getattr(self, "prefix", False):
+            return "HashFactory(%s, %s, prefix=True)" % (
+                str(self.hash_family),
+                str(self.hash_count)
+            )
         return "HashFactory(%s, %s)" % (
             str(self.hash_family),
             str(self.hash_count)
         )
 
+    def hash_all(self, data):
+        """
+            ([bytes]) returns digest of data for every hash function, data
+                      is encoded once for all of them.
+            hash_all(
+                data => str, bytes-like object or int, encoded as keys of
+                        ShiftingBloomFilter
+            )
+        """
+        from .shifting_bloom_filter import encode_key
+        data = encode_key(data)
+        return [hash_fn(data).digest() for hash_fn in self.hash_funcs]
+
     def save2file(self, filename="hash_data.bin"):
         """
             saves a list of hash functions to a binary file
@@ -123,16 +239,27 @@ class HashFactory:
             _gen_hashes(
                 hash_count => amount of hash functions to generate
             )
-            generate hash functions with random salts that are all different
-        """
-
+            generate hash functions with random salts that are all different,
+            fast hash functions get random seeds instead of salts.
+        """
+
+        if self.hash_base is None:
+            for _ in range(hash_count):
+                seed = getrandbits(64)
+                if seed in self.salts:
+                    self.doubles += 1
+                    continue
+                self.salts.append(seed)
+                self.hash_funcs.append(FastHashFunction(seed))
+            return
         for salt in RandomStringGenerator(stream_length=hash_count):
             if salt in self.salts:
                 self.doubles += 1
                 continue
             self.salts.append(salt)
             #h_func = lambda data, salt=salt: self.hash_base(data+salt.encode())
-            self.hash_funcs.append(HashFunction(self.hash_base, salt))
+            function = PrefixHashFunction if self.prefix else HashFunction
+            self.hash_funcs.append(function(self.hash_base, salt))
 
     def __len__(self):
         """
@@ -164,6 +291,25 @@ class HashFactory:
         raise StopIteration
 
 
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def open_data(filename, mode="rb"):
+    """
+        (file object) opens data file, gzip compressed files (recognised by
+        their magic bytes) are decompressed while reading.
+        open_data(
+            filename => name of the file
+            mode => "rb" for bytes or "rt" for text
+        )
+    """
+    with open(filename, "rb") as datafile:
+        compressed = datafile.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+    if compressed:
+        return gzip.open(filename, mode)
+    return open(filename, mode)
+
+
 class CSVDataSet:
     """
         Iterative reader for csv data sets.
@@ -172,14 +318,22 @@ class CSVDataSet:
     def __init__(self, filename, separator=','):
         """
            CSVDataSet(
-                filename => name of the csv file
+                filename => name of the csv file, may be gzip compressed
                 separator => character used to separated values in csv file
                                                             (comma by default)
            )
+
+            Public methods:
+            - close() => close the file
+
+            ** supports: **
+            - iterating over (rows of one column included, blank lines
+                              are skipped)
+            - with statement, closing the file at the end
         """
         self.filename = filename
         self.separator = separator
-        self.file = open(filename)
+        self.file = open_data(filename, "rt")
 
     def __next__(self):
         """
@@ -188,9 +342,11 @@ class CSVDataSet:
             resets the file to position 0, after values have been exhaused.
         """
 
-        csvs = self.file.readline().strip().split(self.separator)
-        if len(csvs) > 1:
-            return csvs
+        line = self.file.readline()
+        while line and not line.strip():
+            line = self.file.readline()
+        if line:
+            return line.strip().split(self.separator)
         self.file.seek(0)
         raise StopIteration
 
@@ -204,6 +360,146 @@ class CSVDataSet:
         """
         return self
 
+    def close(self):
+        """(void) closes the file"""
+        self.file.close()
+
+    def __enter__(self):
+        """returns the data set itself"""
+        return self
+
+    def __exit__(self, *exc_info):
+        """closes the file"""
+        self.close()
+
+
+class ChunkedDataSet:
+    """
+        Streaming reader of CSV or line files, the file is read in chunks
+        of chunk_size bytes and split into batches of at most batch_size
+        keys (with set ids), so memory use does not depend on file size.
+        Keys are bytes, which ShiftingBloomFilter hashes the same as the
+        str they encode. Gzip compressed files are decompressed on the fly.
+    """
+
+    def __init__(self, filename, key_column=0, set_column=None,
+                 separator=",", header=False, batch_size=100000,
+                 chunk_size=1 << 22):
+        """
+            ChunkedDataSet(
+                filename => name of the file, may be gzip compressed
+                key_column => number of the column holding the key
+                set_column => number of the column holding the set id,
+                              by default every key goes to set 0
+                separator => character separating columns
+                header => skip the first line of the file
+                batch_size => most keys in one batch
+                chunk_size => number of bytes read from the file at once
+            )
+
+            Public methods:
+            - load_into(bloom, progress) => insert every key into filter
+            - close() => close the file
+
+            ** supports: **
+            - iterating over, yields (keys, set ids) batches, set ids is 0
+              when there is no set_column
+            - with statement, closing the file at the end
+
+            bytes_read and rows count (uncompressed) bytes and rows read.
+        """
+        self.filename = filename
+        self.key_column = key_column
+        self.set_column = set_column
+        self.separator = separator.encode()
+        self.header = header
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.bytes_read = 0
+        self.rows = 0
+        self.file = open_data(filename, "rb")
+
+    def __repr__(self):
+        """returns a representation of ChunkedDataSet"""
+        return "ChunkedDataSet(%s, %s, %s)" % (self.filename,
+                                               self.key_column,
+                                               self.set_column)
+
+    def _lines(self):
+        """(generator) yields lists of whole lines of every chunk read"""
+        tail = b""
+        while True:
+            chunk = self.file.read(self.chunk_size)
+            if not chunk:
+                break
+            self.bytes_read += len(chunk)
+            lines = (tail + chunk).split(b"\n")
+            tail = lines.pop()
+            yield lines
+        if tail:
+            yield [tail]
+
+    def __iter__(self):
+        """
+            (generator) yields (list of keys, list of set ids or 0) batches
+        """
+        key_column, set_column = self.key_column, self.set_column
+        separator = self.separator
+        skip = self.header
+        keys, set_nos = [], []
+        for lines in self._lines():
+            for line in lines:
+                line = line.rstrip(b"\r")
+                if not line:
+                    continue
+                if skip:
+                    skip = False
+                    continue
+                self.rows += 1
+                columns = line.split(separator)
+                try:
+                    keys.append(columns[key_column])
+                    if set_column is not None:
+                        set_nos.append(int(columns[set_column]))
+                except (IndexError, ValueError):
+                    raise ValueError("Row %d of %s has no key or set id." % (
+                        self.rows, self.filename)) from None
+                if len(keys) == self.batch_size:
+                    yield keys, set_nos if set_column is not None else 0
+                    keys, set_nos = [], []
+        if keys:
+            yield keys, set_nos if set_column is not None else 0
+
+    def load_into(self, bloom, progress=None):
+        """
+            (int) inserts every key into bloom with insert_many, returns
+                  number of inserted keys
+            load_into(
+                bloom => filter to insert into
+                progress => function called with (keys inserted so far,
+                            bytes read so far) after every batch
+            )
+        """
+        inserted = 0
+        for keys, set_nos in self:
+            bloom.insert_many(keys, set_nos)
+            inserted += len(keys)
+            if progress is not None:
+                progress(inserted, self.bytes_read)
+        return inserted
+
+    def close(self):
+        """(void) closes the file"""
+        self.file.close()
+
+    def __enter__(self):
+        """returns the data set itself"""
+        return self
+
+    def __exit__(self, *exc_info):
+        """closes the file"""
+        self.close()
+
 
 class RandomStringGenerator:
     """
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Sliding window shifting bloom filter, forgetting old items.
+    - WindowedShiftingBloomFilter => ring of ShiftingBloomFilter generations
+                                     rotated on a time or count boundary.
+"""
+
+# "Everything flows and nothing abides."
+#           ~ Heraclitus
+
+from collections import deque
+import time
+from .shifting_bloom_filter import ShiftingBloomFilter, MULTIPLE
+from .fast_hash import CAPACITY_HASH_SOURCE
+from .filter_chain import FilterChain
+
+
+class WindowedShiftingBloomFilter(FilterChain):
+    """
+        WindowedShiftingBloomFilter => shifting bloom filter remembering only
+                                       the last generations of items.
+
+        Items are inserted into the newest generation. Once it holds
+        capacity items, or period seconds passed since it was opened, a new
+        empty generation is opened and the oldest one is dropped as a whole.
+        An item is remembered for at least generations - 1 full generations
+        after the one it was inserted into. All generations share hashing,
+        length and hash count, every one of them is sized so that the false
+        positive rate of all generations together stays below error_rate.
+    """
+
+    FILENAME = "wsbf.bin"
+
+    def __init__(self, capacity=10000, error_rate=0.001, generations=4,
+                 period=None, set_count=0, mode=MULTIPLE,
+                 hash_source=CAPACITY_HASH_SOURCE, clock=time.time):
+        """
+        WindowedShiftingBloomFilter(
+            capacity => number of items a generation is sized for, the
+                        newest generation is rotated once it is full
+            error_rate => upper bound of false positive rate of the filter
+            generations => number of live generations, at least 2
+            period => seconds after which the newest generation is rotated,
+                      None rotates only on capacity
+            set_count => how many sets is this filter supposed to support?
+            mode => MULTIPLE if there are multiple sets or MULTISET if its one
+                    set but supporting multiple elements.
+            hash_source => hash source of generations, as in
+                           ShiftingBloomFilter.for_capacity
+            clock => function returning current time in seconds, has to be
+                     picklable for save2file
+        )
+
+        public methods:
+        - insert(item, set_no) => insert item into newest generation
+        - check(item) => check if item is in any live generation
+        - insert_many(items, set_nos) => insert every item
+        - check_many(items) => check every item, returns list of results
+        - rotate() => open a new generation, dropping the oldest one
+        - get_fpr() => false positive rate of the whole filter
+        - save2file(filename) => save filter to file
+        - (class) load_from_file(filename) => load filter from file
+
+        ** supports: **
+        - len (total number of bits in all generations)
+        - in (short-circuits on the first generation that might hold the
+              item)
+        """
+        if generations < 2:
+            raise ValueError("generations has to be at least 2.")
+        if period is not None and period <= 0:
+            raise ValueError("period has to be positive.")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.period = period
+        self.set_count = set_count
+        self.mode = mode
+        self.hash_source = hash_source
+        self.clock = clock
+        first = ShiftingBloomFilter.for_capacity(
+            capacity, 1 - (1 - error_rate) ** (1 / generations),
+            set_count=set_count, mode=mode, hash_source=hash_source
+        )
+        self.generations = deque([first], maxlen=generations)
+        self.opened = clock()
+
+    def __repr__(self):
+        """return string representation of an object constructor"""
+        return "WindowedShiftingBloomFilter(%s, %s, %s, %s, %s, %s, %s)" % (
+            self.capacity,
+            self.error_rate,
+            self.generations.maxlen,
+            self.period,
+            self.set_count,
+            self.mode,
+            self.hash_source
+        )
+
+    def _new_generation(self):
+        """(ShiftingBloomFilter) returns empty filter shaped like the newest"""
+        newest = self.generations[-1]
+        return ShiftingBloomFilter(
+            newest.m, hash_source=newest.hashfunc, hash_count=newest.k,
+            length_as_power=False, mode=self.mode, set_count=self.set_count,
+            block_bits=newest.block_bits
+        )
+
+    def rotate(self):
+        """(void) opens a new generation, the oldest one is dropped"""
+        self.generations.append(self._new_generation())
+        self.opened = self.clock()
+
+    def _expire(self):
+        """(void) rotates once for every period passed since last rotation"""
+        if self.period is None:
+            return
+        elapsed = int((self.clock() - self.opened) // self.period)
+        if elapsed <= 0:
+            return
+        # generations older than the window would be dropped right away
+        for _ in range(min(elapsed, self.generations.maxlen)):
+            self.generations.append(self._new_generation())
+        self.opened += elapsed * self.period
+
+    def _current(self):
+        """(ShiftingBloomFilter) returns generation with room for an item"""
+        self._expire()
+        if self.generations[-1].count >= self.capacity:
+            self.rotate()
+        return self.generations[-1]
+
+    def _filters(self):
+        """(deque of ShiftingBloomFilter) returns live generations"""
+        self._expire()
+        return self.generations
+
+    def _capacity(self):
+        """(int) returns number of items a generation is sized for"""
+        return self.capacity
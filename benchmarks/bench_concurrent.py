@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Throughput of ConcurrentShiftingBloomFilter against number of threads.
+
+Every thread inserts and then checks its own share of keys in one shared
+filter. Scaling with thread count is only expected on a free-threaded
+(no-GIL) CPython build, on a regular build it shows the cost of locking.
+
+usage: PYTHONPATH=. python3 benchmarks/bench_concurrent.py [--keys N]
+                                                   [--threads 1 2 4 8]
+"""
+
+import argparse
+import sys
+import threading
+import time
+from ShiftingBloomFilter import FAST_HASH
+from ShiftingBloomFilter.concurrent_shifting_bloom_filter import (
+    ConcurrentShiftingBloomFilter
+)
+
+
+def _run(threads, work):
+    """(float) runs work(thread_no) on threads threads, returns seconds"""
+    barrier = threading.Barrier(threads + 1)
+
+    def target(thread_no):
+        barrier.wait()
+        work(thread_no)
+
+    pool = [threading.Thread(target=target, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    start = time.perf_counter()
+    barrier.wait()
+    for thread in pool:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def bench(threads, keys, length, hash_count, set_count):
+    """(dict) insert and check throughput for given number of threads"""
+    bloom = ConcurrentShiftingBloomFilter(length, hash_source=FAST_HASH,
+                                          hash_count=hash_count,
+                                          set_count=set_count)
+    shares = [["%d-%d" % (i, j) for j in range(keys // threads)]
+              for i in range(threads)]
+
+    def insert(thread_no):
+        for j, key in enumerate(shares[thread_no]):
+            bloom.insert(key, j % (set_count + 1))
+
+    def check(thread_no):
+        for key in shares[thread_no]:
+            bloom.check(key)
+
+    total = sum(len(share) for share in shares)
+    return {
+        "threads": threads,
+        "insert_ops": total / _run(threads, insert),
+        "check_ops": total / _run(threads, check),
+    }
+
+
+def main():
+    """parses arguments and prints results table"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--keys", type=int, default=200000)
+    parser.add_argument("--threads", type=int, nargs="+",
+                        default=[1, 2, 4, 8])
+    parser.add_argument("--length", type=int, default=24,
+                        help="filter length as power of 2")
+    parser.add_argument("--hash-count", type=int, default=8)
+    parser.add_argument("--set-count", type=int, default=4)
+    args = parser.parse_args()
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print("python %s, GIL %s" % (sys.version.split()[0],
+                                 "enabled" if gil else "disabled"))
+    print("%8s %14s %14s" % ("threads", "insert ops/s", "check ops/s"))
+    for threads in args.threads:
+        result = bench(threads, args.keys, args.length, args.hash_count,
+                       args.set_count)
+        print("%8d %14.0f %14.0f" % (result["threads"],
+                                     result["insert_ops"],
+                                     result["check_ops"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Throughput and latency of the asyncio membership service.
+
+Every client keeps one connection and sends requests one at a time, so
+the number of clients is the number of concurrent requests. Without
+--connect the server runs in the same event loop on a free local port,
+sharing the CPU with the clients.
+
+usage: PYTHONPATH=. python3 benchmarks/bench_server.py [--clients 64]
+            [--requests 200] [--windows 0 0.0005 0.002] [--connect HOST:PORT]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from ShiftingBloomFilter import ShiftingBloomFilter
+from ShiftingBloomFilter.server import MembershipServer
+
+
+def _percentile(values, fraction):
+    """(float) returns fraction percentile of sorted values"""
+    return values[int(fraction * (len(values) - 1))]
+
+
+async def _client(host, port, requests, keys, insert_ratio, latencies):
+    """(void) sends requests one by one, recording their latencies"""
+    reader, writer = await asyncio.open_connection(host, port)
+    rng = random.Random()
+    for _ in range(requests):
+        key = rng.choice(keys)
+        if rng.random() < insert_ratio:
+            line = "INSERT %d %s\n" % (rng.randrange(4), key)
+        else:
+            line = "CHECK %s\n" % key
+        start = time.perf_counter()
+        writer.write(line.encode())
+        reply = await reader.readline()
+        latencies.append(time.perf_counter() - start)
+        if reply.startswith(b"ERR"):
+            raise RuntimeError(reply.decode())
+    writer.write_eof()
+    await reader.read()
+    writer.close()
+
+
+async def bench(args, window):
+    """(dict) throughput, latency percentiles and mean batch size"""
+    keys = ["key-%d" % i for i in range(args.keys)]
+    server = listener = None
+    if args.connect:
+        host, port = args.connect.rsplit(":", 1)
+    else:
+        bloom = ShiftingBloomFilter.for_capacity(args.keys, 0.001,
+                                                 set_count=3)
+        bloom.insert_many(keys[::2], [i % 4 for i in range(len(keys[::2]))])
+        server = MembershipServer(bloom, window, args.max_batch)
+        listener = await server.start()
+        host, port = listener.sockets[0].getsockname()[:2]
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _client(host, port, args.requests, keys, args.insert_ratio,
+                latencies)
+        for _ in range(args.clients)
+    ))
+    elapsed = time.perf_counter() - start
+    if listener is not None:
+        listener.close()
+        await listener.wait_closed()
+    latencies.sort()
+    return {
+        "window": window,
+        "requests_per_s": len(latencies) / elapsed,
+        "p50_ms": _percentile(latencies, 0.5) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "mean_batch": server.requests / server.batches if server else 0,
+    }
+
+
+def main():
+    """parses arguments and prints results table"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=200,
+                        help="requests per client")
+    parser.add_argument("--keys", type=int, default=100000)
+    parser.add_argument("--insert-ratio", type=float, default=0.1)
+    parser.add_argument("--windows", type=float, nargs="+",
+                        default=[0, 0.0005, 0.002])
+    parser.add_argument("--max-batch", type=int, default=1024)
+    parser.add_argument("--connect", default=None,
+                        help="HOST:PORT of a running server")
+    args = parser.parse_args()
+    print("%8s %14s %10s %10s %11s" % ("window", "requests/s", "p50 ms",
+                                        "p99 ms", "mean batch"))
+    for window in ([None] if args.connect else args.windows):
+        result = asyncio.run(bench(args, window))
+        print("%8s %14.0f %10.3f %10.3f %11.1f" % (
+            result["window"], result["requests_per_s"], result["p50_ms"],
+            result["p99_ms"], result["mean_batch"]
+        ))
+
+
+if __name__ == "__main__":
+    main()
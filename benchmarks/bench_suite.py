@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Reproducible benchmark suite of ShiftingBloomFilter.
+
+For every combination of filter length, hash count, hash source and
+max_set it measures ops/s and latency percentiles of insert, check and
+MULTISET insert, time of the save2file/load_from_file round trip and
+compares the empirical false positive rate with get_fpr(). Keys and salts
+come from a seeded random generator, so runs with the same seed use the
+same data. Results are written as JSON, --compare reports ops/s that
+dropped by more than --tolerance against an earlier result file.
+
+usage: PYTHONPATH=. python3 benchmarks/bench_suite.py [--output FILE]
+            [--lengths 16 20] [--hash-counts 4 8] [--max-sets 0 3 15]
+            [--sources guaranteed factory] [--compare OLD.json]
+"""
+
+import argparse
+from hashlib import algorithms_guaranteed
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from ShiftingBloomFilter import ShiftingBloomFilter, MULTISET, FAST_HASH
+from ShiftingBloomFilter.bit_array import _numpy
+from ShiftingBloomFilter.utils import HashFactory, RandomStringGenerator
+
+SOURCES = {
+    "guaranteed": lambda hash_count: algorithms_guaranteed,
+    "factory": lambda hash_count: HashFactory("sha256", hash_count),
+    "fast": lambda hash_count: FAST_HASH,
+}
+
+
+def _keys(count, prefix):
+    """([str]) returns count distinct random keys starting with prefix"""
+    return ["%s%d-%s" % (prefix, i, key) for i, key in enumerate(
+        RandomStringGenerator(string_length=12, ascii_start=48,
+                              ascii_end=122, stream_length=count)
+    )]
+
+
+def _percentile(values, fraction):
+    """(float) returns fraction percentile of sorted values"""
+    return values[int(fraction * (len(values) - 1))]
+
+
+def _timed(operation, arguments):
+    """(dict) calls operation for every argument tuple, returns timings"""
+    clock = time.perf_counter_ns
+    latencies = []
+    for args in arguments:
+        start = clock()
+        operation(*args)
+        latencies.append(clock() - start)
+    total = sum(latencies) / 1e9
+    latencies.sort()
+    return {
+        "ops": len(latencies),
+        "ops_per_s": len(latencies) / total if total else 0.0,
+        "p50_us": _percentile(latencies, 0.5) / 1e3,
+        "p99_us": _percentile(latencies, 0.99) / 1e3,
+    }
+
+
+def _round_trip(bloom, repeat):
+    """(dict) times save2file and load_from_file of bloom"""
+    handle, filename = tempfile.mkstemp(suffix=".bin")
+    os.close(handle)
+    try:
+        save = _timed(bloom.save2file, [(filename,)] * repeat)
+        load = _timed(ShiftingBloomFilter.load_from_file,
+                      [(filename,)] * repeat)
+        size = os.path.getsize(filename)
+    finally:
+        os.remove(filename)
+    return {"save": save, "load": load, "bytes": size}
+
+
+def bench(length, hash_count, source, max_set, args):
+    """(dict) results of one configuration"""
+    random.seed(args.seed)
+    hash_source = SOURCES[source](hash_count)
+    members = _keys(args.items, "m")
+    strangers = _keys(args.probes, "s")
+    bloom = ShiftingBloomFilter(length, hash_source=hash_source,
+                                hash_count=hash_count, set_count=max_set)
+    insert = _timed(bloom.insert, [(key, i % (max_set + 1))
+                                   for i, key in enumerate(members)])
+    check_hit = _timed(bloom.check, [(key,) for key in members])
+    false_positives = [0]
+
+    def check_stranger(key):
+        false_positives[0] += bloom.check(key)[0]
+
+    check_miss = _timed(check_stranger, [(key,) for key in strangers])
+    multiset = ShiftingBloomFilter(length, hash_source=hash_source,
+                                   hash_count=hash_count, mode=MULTISET)
+    copies = max_set + 1
+    multiset_insert = _timed(multiset.insert, [
+        (key,) for key in members[:args.items // copies] for _ in range(copies)
+    ])
+    return {
+        "length": len(bloom),
+        "hash_count": hash_count,
+        "source": source,
+        "max_set": max_set,
+        "items": args.items,
+        "insert": insert,
+        "check_hit": check_hit,
+        "check_miss": check_miss,
+        "multiset_insert": multiset_insert,
+        "round_trip": _round_trip(bloom, args.repeat),
+        "fpr": {
+            "empirical": false_positives[0] / len(strangers),
+            "estimated": bloom.get_fpr(),
+            "from_fill": bloom.get_fpr(from_fill=True),
+        },
+    }
+
+
+def _key(result):
+    """(tuple) identifies configuration of a result"""
+    return (result["length"], result["hash_count"], result["source"],
+            result["max_set"])
+
+
+def compare(results, filename, tolerance):
+    """([str]) describes ops/s regressions against older result file"""
+    with open(filename) as datafile:
+        old = {_key(result): result for result in json.load(datafile)["results"]}
+    regressions = []
+    for result in results:
+        previous = old.get(_key(result))
+        if previous is None:
+            continue
+        for name in ("insert", "check_hit", "check_miss", "multiset_insert"):
+            before = previous[name]["ops_per_s"]
+            after = result[name]["ops_per_s"]
+            if after < before * (1 - tolerance):
+                regressions.append("%s %s: %.0f -> %.0f ops/s" % (
+                    _key(result), name, before, after
+                ))
+    return regressions
+
+
+def main():
+    """runs the sweep, writes JSON and prints summary table"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[16, 20],
+                        help="filter lengths as powers of 2")
+    parser.add_argument("--hash-counts", type=int, nargs="+", default=[4, 8])
+    parser.add_argument("--sources", nargs="+", choices=sorted(SOURCES),
+                        default=["guaranteed", "factory"])
+    parser.add_argument("--max-sets", type=int, nargs="+",
+                        default=[0, 3, 15])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--probes", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="save/load round trips per configuration")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--compare", default=None,
+                        help="earlier result file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    results = []
+    print("%6s %2s %10s %3s %10s %10s %10s %9s %9s" % (
+        "length", "k", "source", "max", "insert/s", "check/s", "p99 us",
+        "fpr", "get_fpr"), file=sys.stderr)
+    for length in args.lengths:
+        for hash_count in args.hash_counts:
+            for source in args.sources:
+                for max_set in args.max_sets:
+                    result = bench(length, hash_count, source, max_set, args)
+                    results.append(result)
+                    print("%6d %2d %10s %3d %10.0f %10.0f %10.1f %9.5f %9.5f"
+                          % (length, hash_count, source, max_set,
+                             result["insert"]["ops_per_s"],
+                             result["check_hit"]["ops_per_s"],
+                             result["check_hit"]["p99_us"],
+                             result["fpr"]["empirical"],
+                             result["fpr"]["estimated"]), file=sys.stderr)
+    report = {
+        "meta": {
+            "python": sys.version.split()[0],
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "numpy": _numpy() is not None,
+            "seed": args.seed,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "arguments": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as datafile:
+        json.dump(report, datafile, indent=1)
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for regression in regressions:
+            print("REGRESSION %s" % regression, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
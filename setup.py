@@ -6,7 +6,7 @@ from distutils.core import setup
 setup(name="ShiftingBloomFilter",
       version="0.01b",
       description="Implementation of shifting bloom filter data structure",
-      python_requires=">3.0",
+      python_requires=">=3.8",
       packages=["ShiftingBloomFilter"]
       )
 
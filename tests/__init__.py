@@ -0,0 +1 @@
+"""Tests of the ShiftingBloomFilter package, run with python -m pytest."""
@@ -0,0 +1,16 @@
+"""Fixtures shared by the tests."""
+
+import pytest
+
+from ShiftingBloomFilter import bit_array
+
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    """runs a test with numpy (when installed) and with python loops"""
+    if request.param == "numpy":
+        if bit_array._numpy() is None:
+            pytest.skip("numpy is not installed")
+    else:
+        monkeypatch.setattr(bit_array, "_numpy_module", None)
+    return request.param
@@ -0,0 +1,113 @@
+"""Tests of packed bit and counter storage, with and without numpy."""
+
+import random
+
+import pytest
+
+from ShiftingBloomFilter import bit_array
+from ShiftingBloomFilter.bit_array import BitArray, CounterArray
+
+
+def random_bits(length, seed):
+    rng = random.Random(seed)
+    bits = BitArray(length)
+    for index in range(length):
+        if rng.random() < 0.3:
+            bits[index] = 1
+    return bits
+
+
+def test_set_and_test():
+    bits = BitArray(21)
+    assert not bits
+    assert bits.set(20)
+    assert not bits.set(20)
+    assert bits.test(20) and bits[-1] == 1 and not bits.test(19)
+    bits[20] = 0
+    assert not bits
+    assert list(bits) == [0] * 21
+    with pytest.raises(IndexError):
+        bits[21]
+
+
+def test_set_many_and_test_many(backend):
+    positions = [0, 5, 9, 63, 64, 99]
+    bits = BitArray(100)
+    if backend == "numpy":
+        positions = bit_array._numpy().array(positions)
+    bits.set_many(positions)
+    assert list(bits.test_many(positions)) == [True] * 6
+    assert bits.popcount() == 6
+    assert list(bits) == [int(index in (0, 5, 9, 63, 64, 99))
+                          for index in range(100)]
+
+
+def test_get_window_wraps_around_region():
+    bits = random_bits(200, 3)
+    for start, span in ((0, 200), (64, 64), (128, 72)):
+        for index in range(start, start + span, 7):
+            for width in (1, 9, 64, 150):
+                window = bits.get_window(index, width, start, span)
+                expected = [bits[start + (index - start + offset) % span]
+                            for offset in range(width)]
+                assert [(window >> offset) & 1
+                        for offset in range(width)] == expected
+
+
+def test_from_buffer_shares_memory():
+    buffer = bytearray(4)
+    bits = BitArray.from_buffer(32, buffer)
+    bits.set(9)
+    assert buffer == b"\x00\x02\x00\x00"
+
+
+@pytest.mark.parametrize("length", [1, 8, 77, 1000])
+def test_union_and_intersection(length, backend):
+    left, right = random_bits(length, 1), random_bits(length, 2)
+    union = BitArray(length)
+    union.union_update(left)
+    union.union_update(right)
+    assert list(union) == [a | b for a, b in zip(left, right)]
+    left.intersection_update(right)
+    assert list(left) == [a & b for a, b in zip(random_bits(length, 1),
+                                                right)]
+    assert left.popcount() == sum(left)
+
+
+@pytest.mark.parametrize("width", CounterArray.WIDTHS)
+def test_counters_saturate_and_remove(width):
+    counters = CounterArray(10, width)
+    assert counters.set(3)
+    assert not counters.set(3)
+    assert counters[3] == min(2, counters.max_value)
+    for _ in range(300):
+        counters.set(4)
+    assert counters[4] == counters.max_value
+    assert not counters.remove(4)
+    assert counters[4] == counters.max_value
+    assert counters.popcount() == 2
+    counters[5] = 1
+    if width > 1:
+        assert counters.remove(5) and counters[5] == 0
+    else:
+        assert not counters.remove(5) and counters[5] == 1
+
+
+@pytest.mark.parametrize("width", CounterArray.WIDTHS)
+@pytest.mark.parametrize("length", [1, 7, 1001])
+def test_counter_union_and_intersection(width, length, backend):
+    rng = random.Random(width * length)
+    left, right = CounterArray(length, width), CounterArray(length, width)
+    for index in range(length):
+        left[index] = rng.randrange(left.max_value + 1)
+        right[index] = rng.randrange(left.max_value + 1)
+    union = CounterArray(length, width)
+    union.union_update(left)
+    union.union_update(right)
+    assert list(union) == [min(a + b, left.max_value)
+                           for a, b in zip(left, right)]
+    expected = [min(a, b) for a, b in zip(left, right)]
+    left.intersection_update(right)
+    assert list(left) == expected
+    with pytest.raises(ValueError):
+        left.union_update(CounterArray(length, 8 if width != 8 else 4))
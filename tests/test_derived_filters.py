@@ -0,0 +1,202 @@
+"""Tests of filters derived from ShiftingBloomFilter."""
+
+import threading
+
+import pytest
+
+from ShiftingBloomFilter import (ShiftingBloomFilter,
+                                 CountingShiftingBloomFilter,
+                                 ConcurrentShiftingBloomFilter,
+                                 ScalableShiftingBloomFilter,
+                                 WindowedShiftingBloomFilter, MULTISET,
+                                 FAST_HASH)
+from ShiftingBloomFilter import (shifting_bloom_filter,
+                                 concurrent_shifting_bloom_filter)
+from ShiftingBloomFilter.exceptions import IncompatibleFiltersError
+
+KEYS = ["key-%d" % number for number in range(400)]
+
+
+def run_threads(target, count=4):
+    """runs target(part) in count threads and waits for all of them"""
+    threads = [threading.Thread(target=target, args=(part,))
+               for part in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_counting_filter_matches_plain_filter():
+    plain = ShiftingBloomFilter(12, hash_source=FAST_HASH, hash_count=4,
+                                set_count=3)
+    counting = CountingShiftingBloomFilter(12, hash_source=FAST_HASH,
+                                           hash_count=4, set_count=3)
+    for number, key in enumerate(KEYS):
+        plain.insert(key, number % 4)
+        counting.insert(key, number % 4)
+    probes = KEYS + ["other-%d" % number for number in range(400)]
+    assert [counting.check(item) for item in probes] == [
+        plain.check(item) for item in probes]
+    assert counting.check_many(probes) == plain.check_many(probes)
+    assert counting.bit_count == plain.bit_count
+
+
+def test_counting_filter_removes_items():
+    bloom = CountingShiftingBloomFilter(12, hash_source=FAST_HASH,
+                                        hash_count=4, set_count=2)
+    bloom.insert("apple", 2)
+    bloom.insert("pear", 1)
+    assert bloom.remove("apple", 2)
+    assert bloom.check("apple") == (False, [])
+    assert bloom.check("pear") == (True, [1])
+    assert not bloom.remove("apple", 2)
+    assert bloom.count == 1
+    assert bloom.bit_count == bloom.filter.popcount()
+
+
+def test_counting_multiset_removes_one_copy():
+    bloom = CountingShiftingBloomFilter(12, hash_source=FAST_HASH,
+                                        hash_count=4, mode=MULTISET)
+    for _ in range(3):
+        bloom.insert("apple")
+    assert bloom.check("apple") == (True, 3)
+    assert bloom.remove("apple")
+    assert bloom.check("apple") == (True, 2)
+
+
+def test_counting_merge_adds_counters():
+    left = CountingShiftingBloomFilter(10, hash_source=FAST_HASH,
+                                       hash_count=4)
+    right = CountingShiftingBloomFilter(10, hash_source=FAST_HASH,
+                                        hash_count=4)
+    left.insert("apple")
+    right.insert("apple")
+    left.merge(right)
+    assert left.remove("apple")
+    assert left.check("apple")[0]
+    with pytest.raises(IncompatibleFiltersError):
+        left.merge(CountingShiftingBloomFilter(10, hash_source=FAST_HASH,
+                                               hash_count=4,
+                                               counter_width=8))
+    with pytest.raises(IncompatibleFiltersError):
+        left.merge(ShiftingBloomFilter(10, hash_source=FAST_HASH,
+                                       hash_count=4))
+
+
+@pytest.mark.parametrize("mode", [True, MULTISET])
+def test_concurrent_inserts_match_sequential(mode):
+    sequential = ShiftingBloomFilter(12, hash_source=FAST_HASH, hash_count=4,
+                                     mode=mode)
+    concurrent = ConcurrentShiftingBloomFilter(12, hash_source=FAST_HASH,
+                                               hash_count=4, mode=mode,
+                                               stripes=4)
+    keys = KEYS[:50] * 3
+    for key in keys:
+        sequential.insert(key)
+
+    def insert(part):
+        for key in keys[part::4]:
+            concurrent.insert(key)
+
+    run_threads(insert)
+    assert concurrent.count == sequential.count
+    assert concurrent.bit_count == concurrent.filter.popcount()
+    if mode:
+        assert concurrent.filter == sequential.filter
+    else:
+        # multiplicities of a multiset depend on the order of inserts
+        assert all(concurrent.check(key)[0] for key in KEYS[:50])
+
+
+def test_concurrent_multiset_keeps_every_copy():
+    bloom = ConcurrentShiftingBloomFilter(14, hash_source=FAST_HASH,
+                                          hash_count=4, mode=MULTISET)
+
+    def insert(part):
+        for _ in range(25):
+            bloom.insert("apple")
+
+    run_threads(insert)
+    assert bloom.check("apple") == (True, 100)
+    assert bloom.count == 100
+    bloom.insert(bytearray(b"apple"))
+    assert bloom.check(memoryview(b"apple")) == (True, 101)
+
+
+def test_concurrent_multiset_encodes_a_key_once(monkeypatch):
+    calls = []
+    original = shifting_bloom_filter.encode_key
+
+    def encode_key(item):
+        calls.append(item)
+        return original(item)
+    monkeypatch.setattr(concurrent_shifting_bloom_filter, "encode_key",
+                        encode_key)
+    monkeypatch.setattr(shifting_bloom_filter, "encode_key", encode_key)
+    bloom = ConcurrentShiftingBloomFilter(12, hash_source=FAST_HASH,
+                                          hash_count=4, mode=MULTISET)
+    bloom.insert("apple")
+    assert calls == ["apple"]
+
+
+def test_scalable_filter_opens_stages():
+    bloom = ScalableShiftingBloomFilter(100, 0.01, set_count=3)
+    bloom.insert_many(KEYS, [number % 4 for number in range(len(KEYS))])
+    assert len(bloom.stages) == 3
+    assert bloom.count == len(KEYS)
+    assert all(number % 4 in bloom.check(key)[1]
+               for number, key in enumerate(KEYS))
+    assert bloom.check_many(KEYS) == [bloom.check(key) for key in KEYS]
+    assert KEYS[0] in bloom
+    assert bloom.get_fpr() <= 0.01
+
+
+def test_scalable_multiset_sums_counts():
+    bloom = ScalableShiftingBloomFilter(20, 0.01, mode=MULTISET)
+    for _ in range(30):
+        bloom.insert("apple")
+    assert len(bloom.stages) == 2
+    assert bloom.check("apple") == (True, 30)
+
+
+def test_windowed_filter_forgets_old_generations():
+    now = [0.0]
+    bloom = WindowedShiftingBloomFilter(100, 0.01, generations=3, period=10,
+                                        clock=lambda: now[0], mode=MULTISET)
+    for _ in range(150):
+        bloom.insert("apple")
+    assert bloom.check("apple") == (True, 150)
+    assert len(bloom.generations) == 2
+    now[0] = 15.0
+    bloom.insert("pear")
+    assert bloom.check("pear") == (True, 1)
+    now[0] = 100.0
+    assert bloom.check("apple") == (False, 0)
+    assert not bloom
+    assert bloom.check_many(["apple", "pear"]) == [(False, 0), (False, 0)]
+
+
+def test_windowed_filter_keeps_generations_items():
+    bloom = WindowedShiftingBloomFilter(50, 0.01, generations=2,
+                                        set_count=1, hash_source=FAST_HASH)
+    bloom.insert_many(KEYS[:150], 1)
+    assert bloom.count == 100
+    assert all(bloom.check(key) == (True, [1]) for key in KEYS[50:150])
+    assert bloom.get_fpr() <= 0.01
+
+
+@pytest.mark.parametrize("cls, name", [
+    (ScalableShiftingBloomFilter, "ssbf.bin"),
+    (WindowedShiftingBloomFilter, "wsbf.bin"),
+])
+def test_chain_round_trip(cls, name, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    bloom = cls(50, 0.01, set_count=1)
+    bloom.insert_many(KEYS[:120], 1)
+    bloom.save2file()
+    assert (tmp_path / name).exists()
+    loaded = cls.load_from_file()
+    assert loaded.check_many(KEYS) == bloom.check_many(KEYS)
+    assert (loaded.count, len(loaded)) == (bloom.count, len(bloom))
+    assert KEYS[0] in loaded and "missing" not in loaded
@@ -0,0 +1,70 @@
+"""Tests of the seeded xxh64 hash family."""
+
+import pytest
+
+from ShiftingBloomFilter import ShiftingBloomFilter, FAST_HASH, fast_hash
+from ShiftingBloomFilter.fast_hash import (_py_xxh64, xxh64, FastHashFamily,
+                                           FastHashFunction,
+                                           CAPACITY_HASH_SOURCE)
+from ShiftingBloomFilter.utils import HashFactory
+
+# digests published with the reference implementation of XXH64
+VECTORS = [
+    (b"", 0, 0xef46db3751d8e999),
+    (b"a", 0, 0xd24ec4f1a98c6e5b),
+    (b"abc", 0, 0x44bc2cf5ad770999),
+    (b"xxhash", 0, 0x32dd38952c4bc720),
+    (b"xxhash", 20141025, 0xb559b98d844e0635),
+    (b"Nobody inspects the spammish repetition", 0, 0xfbcea83c8a378bf1),
+]
+
+
+@pytest.mark.parametrize("data, seed, expected", VECTORS)
+def test_known_answers(data, seed, expected):
+    assert _py_xxh64(data, seed) == expected
+    assert xxh64(data, seed) == expected
+
+
+@pytest.mark.skipif(fast_hash.xxhash is None,
+                    reason="xxhash is not installed")
+def test_lengths_around_stripes_match_accelerated_digest():
+    # every tail of 8, 4 and 1 byte lanes after 0, 1 and 2 stripes
+    data = bytes(range(100))
+    for length in range(80):
+        assert _py_xxh64(data[:length], 7) == xxh64(data[:length], 7)
+
+
+def test_family_functions_are_independent():
+    family = FastHashFamily(20, seed=5)
+    assert len(family) == 20 and len(family[:4]) == 4
+    assert family == FastHashFamily(20, seed=5)
+    assert family != FastHashFamily(20, seed=6)
+    assert len({function.intdigest(b"key") for function in family}) == 20
+    function = FastHashFunction(3)
+    assert function(b"key").digest() == function.intdigest(
+        b"key").to_bytes(8, "big")
+
+
+def test_fast_hash_source():
+    bloom = ShiftingBloomFilter(12, hash_source=FAST_HASH, hash_count=20,
+                                set_count=2)
+    bloom.insert("apple", 2)
+    assert bloom.k == 20
+    assert bloom.check("apple") == (True, [2])
+    assert bloom.check("pear") == (False, [])
+    factory = HashFactory(FAST_HASH, 6)
+    assert len({function.seed for function in factory}) == 6
+    assert all(isinstance(function, FastHashFunction) for function in factory)
+
+
+def test_sized_filters_use_fast_hash_only_in_c():
+    bloom = ShiftingBloomFilter.for_capacity(100, 0.01)
+    if fast_hash.xxhash is None:
+        assert CAPACITY_HASH_SOURCE == "sha256"
+        assert not any(isinstance(function, FastHashFunction)
+                       for function in bloom.hashfunc)
+    else:
+        assert CAPACITY_HASH_SOURCE == FAST_HASH
+        assert isinstance(bloom.hashfunc, FastHashFamily)
+    bloom.insert("apple")
+    assert bloom.check("apple") == (True, [0])
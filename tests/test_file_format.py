@@ -0,0 +1,190 @@
+"""Round trips through pickle, the binary format and memory maps."""
+
+import pickle
+
+import pytest
+
+from ShiftingBloomFilter import (ShiftingBloomFilter,
+                                 CountingShiftingBloomFilter,
+                                 ConcurrentShiftingBloomFilter, MULTISET,
+                                 FAST_HASH)
+from ShiftingBloomFilter.utils import HashFactory
+from ShiftingBloomFilter.file_format import HEADER, VERSION
+from ShiftingBloomFilter.exceptions import FileFormatError
+
+KEYS = ["key-%d" % number for number in range(200)]
+PROBES = KEYS + ["other-%d" % number for number in range(200)]
+
+FILTERS = {
+    "plain": lambda: ShiftingBloomFilter(12, set_count=3),
+    "fast": lambda: ShiftingBloomFilter(12, hash_source=FAST_HASH,
+                                        hash_count=5, set_count=3),
+    "salted": lambda: ShiftingBloomFilter(
+        12, hash_source=HashFactory("sha256", 4), set_count=3),
+    "prefix": lambda: ShiftingBloomFilter(
+        12, hash_source=HashFactory("blake2b", 4, prefix=True), set_count=3),
+    "blocked": lambda: ShiftingBloomFilter(
+        1 << 12, hash_source=FAST_HASH, hash_count=6, length_as_power=False,
+        set_count=3, block_bits=512),
+    "multiset": lambda: ShiftingBloomFilter(
+        12, hash_source=FAST_HASH, hash_count=4, mode=MULTISET, max_count=5),
+    "counting": lambda: CountingShiftingBloomFilter(
+        12, hash_source=FAST_HASH, hash_count=4, set_count=3,
+        counter_width=2),
+}
+
+
+def filled(name):
+    """filter of the given kind holding KEYS"""
+    bloom = FILTERS[name]()
+    for number, key in enumerate(KEYS):
+        bloom.insert(key, number % 4)
+    return bloom
+
+
+def assert_same(loaded, bloom):
+    assert type(loaded) is type(bloom)
+    assert loaded.filter == bloom.filter
+    assert (loaded.m, loaded.k, loaded.mode, loaded.max_set, loaded.count,
+            loaded.max_count, loaded.block_bits) == (
+        bloom.m, bloom.k, bloom.mode, bloom.max_set, bloom.count,
+        bloom.max_count, bloom.block_bits)
+    assert loaded.bit_count == bloom.bit_count
+    assert [loaded.check(item) for item in PROBES] == [
+        bloom.check(item) for item in PROBES]
+
+
+@pytest.mark.parametrize("name", sorted(FILTERS))
+def test_pickle_round_trip(name, tmp_path):
+    bloom = filled(name)
+    path = str(tmp_path / "sbf.bin")
+    bloom.save2file(path)
+    assert_same(ShiftingBloomFilter.load_from_file(path), bloom)
+    assert_same(pickle.loads(pickle.dumps(bloom)), bloom)
+
+
+@pytest.mark.parametrize("name", sorted(FILTERS))
+def test_binary_round_trip(name, tmp_path):
+    bloom = filled(name)
+    path = str(tmp_path / "sbf.sbf")
+    bloom.save_binary(path)
+    assert_same(type(bloom).load_binary(path), bloom)
+
+
+@pytest.mark.parametrize("name", sorted(FILTERS))
+def test_mmap_round_trip(name, tmp_path):
+    bloom = filled(name)
+    path = str(tmp_path / "sbf.sbf")
+    bloom.save_binary(path)
+    with type(bloom).open_mmap(path) as mapped:
+        assert_same(mapped, bloom)
+        assert mapped.check_many(PROBES) == bloom.check_many(PROBES)
+
+
+def test_loaded_filter_counts_bits_lazily(tmp_path):
+    bloom = filled("fast")
+    path = str(tmp_path / "sbf.sbf")
+    bloom.save_binary(path)
+    for loaded in (ShiftingBloomFilter.load_binary(path),
+                   ShiftingBloomFilter.open_mmap(path, readonly=False)):
+        assert loaded._bit_count is None
+        loaded.insert("late")
+        assert loaded._bit_count is None
+        assert loaded.bit_count == loaded.filter.popcount()
+        loaded.insert("later")
+        assert loaded.bit_count == loaded.filter.popcount()
+        loaded.close()
+
+
+def test_writable_mmap_stores_inserts(tmp_path):
+    bloom = filled("fast")
+    path = str(tmp_path / "sbf.sbf")
+    bloom.save_binary(path)
+    with ShiftingBloomFilter.open_mmap(path, readonly=False) as mapped:
+        mapped.insert("late", 7)
+    loaded = ShiftingBloomFilter.load_binary(path)
+    assert loaded.check("late") == (True, [7])
+    assert (loaded.count, loaded.max_set) == (bloom.count + 1, 7)
+
+
+def test_concurrent_filter_round_trip():
+    bloom = ConcurrentShiftingBloomFilter(12, hash_source=FAST_HASH,
+                                          hash_count=4, stripes=8)
+    for key in KEYS:
+        bloom.insert(key)
+    copy = pickle.loads(pickle.dumps(bloom))
+    assert copy.stripes == 8 and len(copy._locks) == 8
+    assert_same(copy, bloom)
+
+
+def rewrite_header(path, **fields):
+    """rewrites header fields of a saved filter in place"""
+    names = ("magic", "version", "flags", "max_count", "m", "k", "max_set",
+             "count", "spec_length", "block_bits")
+    with open(path, "r+b") as datafile:
+        header = dict(zip(names, HEADER.unpack(datafile.read(HEADER.size))))
+        header.update(fields)
+        datafile.seek(0)
+        datafile.write(HEADER.pack(*(header[name] for name in names)))
+
+
+@pytest.mark.parametrize("fields", [
+    {"magic": b"NOPE"},
+    {"version": VERSION + 1},
+    {"m": 0},
+    {"m": 1 << 20},
+    {"block_bits": 7},
+    {"max_set": 2 ** 40},
+    {"flags": 3 << 2},
+    {"flags": 2, "m": 200},
+    {"k": 3},
+])
+def test_invalid_header_is_rejected(fields, tmp_path):
+    path = str(tmp_path / "sbf.sbf")
+    ShiftingBloomFilter(256, hash_source=FAST_HASH, hash_count=4,
+                        length_as_power=False).save_binary(path)
+    rewrite_header(path, **fields)
+    with pytest.raises(FileFormatError):
+        ShiftingBloomFilter.load_binary(path)
+    with pytest.raises(FileFormatError):
+        ShiftingBloomFilter.open_mmap(path)
+
+
+def test_invalid_filter_is_not_saved(tmp_path):
+    bloom = ShiftingBloomFilter(8, hash_source=FAST_HASH, hash_count=4,
+                                set_count=300)
+    with pytest.raises(FileFormatError):
+        bloom.save_binary(str(tmp_path / "sbf.sbf"))
+
+
+def test_truncated_file_is_rejected(tmp_path):
+    path = str(tmp_path / "sbf.sbf")
+    filled("fast").save_binary(path)
+    with open(path, "r+b") as datafile:
+        datafile.truncate(HEADER.size + 100)
+    with pytest.raises(FileFormatError):
+        ShiftingBloomFilter.load_binary(path)
+    with pytest.raises(FileFormatError):
+        ShiftingBloomFilter.open_mmap(path)
+
+
+@pytest.mark.parametrize("fields", [{"m": 1 << 40},
+                                    {"spec_length": (1 << 32) - 8}])
+def test_oversized_header_is_rejected_before_allocating(fields, tmp_path):
+    # a 64 byte file declaring terabytes of bits or spec
+    path = str(tmp_path / "sbf.sbf")
+    ShiftingBloomFilter(256, hash_source=FAST_HASH, hash_count=4,
+                        length_as_power=False).save_binary(path)
+    rewrite_header(path, **fields)
+    with open(path, "r+b") as datafile:
+        datafile.truncate(64)
+    with pytest.raises(FileFormatError):
+        ShiftingBloomFilter.load_binary(path)
+    with pytest.raises(FileFormatError):
+        ShiftingBloomFilter.open_mmap(path)
+
+
+def test_unserialisable_hash_is_rejected(tmp_path):
+    bloom = ShiftingBloomFilter(8, hash_source=[lambda data: None] * 2)
+    with pytest.raises(FileFormatError):
+        bloom.save_binary(str(tmp_path / "sbf.sbf"))
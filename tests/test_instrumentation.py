@@ -0,0 +1,59 @@
+"""Tests of the opt-in hot-path instrumentation."""
+
+import pickle
+
+from ShiftingBloomFilter import ShiftingBloomFilter, FAST_HASH
+
+
+def new_filter():
+    return ShiftingBloomFilter(12, hash_source=FAST_HASH, hash_count=4,
+                               set_count=5)
+
+
+def test_counters():
+    bloom = new_filter()
+    bloom.enable_stats()
+    bloom.insert("apple", 5)
+    bloom.insert("apple", 5)
+    assert bloom.check("apple") == (True, [5])
+    stats = bloom.stats()
+    assert (stats["inserts"], stats["checks"]) == (2, 1)
+    assert stats["digests"] == 3 * 4
+    assert stats["hash_ns"] > 0
+    assert stats["bits_set"] == bloom.filter.popcount()
+    assert stats["bits_set"] + stats["bits_already_set"] == 2 * 4
+    assert stats["offsets_scanned"] >= stats["max_scan"] > 0
+    assert stats["fill_ratio"] == bloom.filter.popcount() / bloom.m
+    assert stats["estimated_fpr"] == bloom.get_fpr()
+    assert (stats["count"], stats["max_set"]) == (2, 5)
+    bloom.disable_stats()
+    bloom.insert("pear")
+    assert "inserts" not in bloom.stats()
+
+
+def test_sink_receives_stats_every_n_items():
+    bloom = new_filter()
+    received = []
+    bloom.enable_stats(sink=received.append, every=10)
+    for number in range(25):
+        bloom.insert("key-%d" % number)
+    assert [stats["inserts"] for stats in received] == [10, 20]
+    bloom.check_many(["key-%d" % number for number in range(10)])
+    assert received[-1]["checks"] == 10
+
+
+def test_slow_scans_record_their_keys():
+    bloom = new_filter()
+    stats = bloom.enable_stats(slow_scan=6)
+    bloom.insert("apple", 5)
+    bloom.check("apple")
+    assert stats.counters()["slow_keys"] == [("apple", 6)]
+    stats.reset()
+    assert stats.counters()["slow_keys"] == []
+    assert stats.digests == 0
+
+
+def test_stats_are_not_copied():
+    bloom = new_filter()
+    bloom.enable_stats()
+    assert "inserts" not in pickle.loads(pickle.dumps(bloom)).stats()
@@ -0,0 +1,44 @@
+"""Tests of the lazily imported package."""
+
+import os
+import subprocess
+import sys
+
+import ShiftingBloomFilter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAZY = ["ShiftingBloomFilter.utils", "ShiftingBloomFilter.file_format",
+        "ShiftingBloomFilter.parallel", "ShiftingBloomFilter.server",
+        "ShiftingBloomFilter.visualiser",
+        "ShiftingBloomFilter.concurrent_shifting_bloom_filter",
+        "ShiftingBloomFilter.counting_shifting_bloom_filter",
+        "ShiftingBloomFilter.scalable_shifting_bloom_filter",
+        "ShiftingBloomFilter.windowed_shifting_bloom_filter",
+        "ShiftingBloomFilter.sharded_shifting_bloom_filter"]
+
+
+def loaded_after_import(modules):
+    """modules that a fresh interpreter loads with the package"""
+    code = ("import sys, ShiftingBloomFilter\n"
+            "print(' '.join(name for name in sys.argv[1:] "
+            "if name in sys.modules))")
+    output = subprocess.run([sys.executable, "-c", code] + modules,
+                            cwd=ROOT, check=True, stdout=subprocess.PIPE,
+                            universal_newlines=True).stdout
+    return output.split()
+
+
+def test_import_leaves_submodules_unloaded():
+    assert loaded_after_import(LAZY + ["concurrent.futures", "json", "numpy",
+                                      "pickle"]) == []
+
+
+def test_submodules_load_on_access():
+    assert ShiftingBloomFilter.utils.HashFactory
+    assert "file_format" in dir(ShiftingBloomFilter)
+
+
+def test_filters_load_on_access():
+    assert ShiftingBloomFilter.ScalableShiftingBloomFilter.__name__ == (
+        "ScalableShiftingBloomFilter")
+    assert "ConcurrentShiftingBloomFilter" in dir(ShiftingBloomFilter)
@@ -0,0 +1,32 @@
+"""Tests of build_parallel."""
+
+import pytest
+
+from ShiftingBloomFilter import (ShiftingBloomFilter,
+                                 CountingShiftingBloomFilter, MULTISET,
+                                 FAST_HASH)
+from ShiftingBloomFilter.parallel import build_parallel
+
+KEYS = ["key-%d" % number for number in range(1000)]
+
+
+def test_build_parallel_equals_insert_many():
+    built = build_parallel(enumerate(KEYS), workers=2,
+                           key_of=lambda item: item[1],
+                           set_of=lambda item: item[0] % 3, chunk_size=150,
+                           length=12, hash_source=FAST_HASH, hash_count=4)
+    expected = ShiftingBloomFilter(12, hash_source=FAST_HASH, hash_count=4)
+    expected.insert_many(KEYS, [number % 3 for number in range(len(KEYS))])
+    assert built.filter == expected.filter
+    assert (built.count, built.max_set, built.bit_count) == (
+        expected.count, expected.max_set, expected.bit_count)
+
+
+@pytest.mark.parametrize("bloom", [
+    CountingShiftingBloomFilter(10, hash_source=FAST_HASH, hash_count=4),
+    ShiftingBloomFilter(10, hash_source=FAST_HASH, hash_count=4,
+                        mode=MULTISET),
+])
+def test_build_parallel_rejects_unsupported_filters(bloom):
+    with pytest.raises(ValueError):
+        build_parallel(KEYS, workers=2, bloom=bloom)
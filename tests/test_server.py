@@ -0,0 +1,89 @@
+"""Tests of MembershipServer and its line protocol."""
+
+import asyncio
+import json
+
+from ShiftingBloomFilter import ShiftingBloomFilter, MULTISET, FAST_HASH
+from ShiftingBloomFilter.server import MembershipServer
+
+KEYS = ["key-%d" % number for number in range(50)]
+
+
+def new_filter(**kwargs):
+    return ShiftingBloomFilter(12, hash_source=FAST_HASH, hash_count=4,
+                               **kwargs)
+
+
+def test_concurrent_requests_are_coalesced():
+    async def run():
+        server = MembershipServer(new_filter(set_count=2), window=0.01)
+        inserts = [server.insert(key, number % 3)
+                   for number, key in enumerate(KEYS)]
+        checks = [server.check(key) for key in KEYS + ["missing"]]
+        await asyncio.gather(*inserts)
+        return server, await asyncio.gather(*checks)
+
+    server, results = asyncio.run(run())
+    assert (server.batches, server.requests) == (1, 2 * len(KEYS) + 1)
+    # checks queued after the inserts of the same batch see them
+    assert results == [server.bloom.check(key) for key in KEYS + ["missing"]]
+    assert all(number % 3 in sets
+               for number, (_, sets) in enumerate(results[:-1]))
+
+
+def test_full_batch_is_processed_at_once():
+    async def run():
+        server = MembershipServer(new_filter(), window=60, max_batch=10)
+        results = await asyncio.gather(*(server.check(key)
+                                         for key in KEYS[:30]))
+        return server, results
+
+    server, results = asyncio.run(run())
+    assert (server.batches, server.requests) == (3, 30)
+    assert results == [(False, [])] * 30
+
+
+async def exchange(server, lines):
+    """sends lines over tcp and returns the reply lines"""
+    listener = await server.start()
+    host, port = listener.sockets[0].getsockname()[:2]
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write("".join(line + "\n" for line in lines).encode())
+    replies = [(await reader.readline()).decode().rstrip("\n")
+               for _ in lines]
+    writer.close()
+    listener.close()
+    await listener.wait_closed()
+    return replies
+
+
+def test_line_protocol():
+    server = MembershipServer(new_filter(set_count=2))
+    replies = asyncio.run(exchange(server, [
+        "INSERT 2 apple", "CHECK apple", "CHECK pear", "INSERT x apple",
+        "DELETE apple", "CHECK apple",
+    ]))
+    assert replies[0] == "OK"
+    assert json.loads(replies[1]) == [True, [2]]
+    assert json.loads(replies[2]) == [False, []]
+    assert replies[3].startswith("ERR ")
+    assert replies[4].startswith("ERR ")
+    assert json.loads(replies[5]) == [True, [2]]
+
+
+def test_multiset_counts_are_returned():
+    server = MembershipServer(new_filter(mode=MULTISET))
+    replies = asyncio.run(exchange(server, ["INSERT 0 apple"] * 3
+                                   + ["CHECK apple"]))
+    assert replies == ["OK"] * 3 + ["[true, 3]"]
+
+
+def test_invalid_set_ids_are_rejected():
+    server = MembershipServer(new_filter(set_count=2), max_set_no=10)
+    replies = asyncio.run(exchange(server, [
+        "INSERT \u00b2 apple", "INSERT 11 apple", "INSERT -1 apple",
+        "INSERT %s apple" % ("9" * 5000), "INSERT 10 apple", "CHECK apple",
+    ]))
+    assert all(reply.startswith("ERR ") for reply in replies[:4])
+    assert replies[4] == "OK"
+    assert json.loads(replies[5]) == [True, [10]]
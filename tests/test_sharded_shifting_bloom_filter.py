@@ -0,0 +1,95 @@
+"""Tests of ShardedShiftingBloomFilter and its per-shard persistence."""
+
+import pytest
+
+from ShiftingBloomFilter import (ShardedShiftingBloomFilter,
+                                 CountingShiftingBloomFilter,
+                                 ConcurrentShiftingBloomFilter, FAST_HASH)
+from ShiftingBloomFilter.exceptions import FileFormatError
+
+KEYS = ["key-%d" % number for number in range(300)]
+
+
+def sharded(**kwargs):
+    kwargs.setdefault("shard_count", 4)
+    return ShardedShiftingBloomFilter(10, hash_source=FAST_HASH,
+                                      hash_count=4, set_count=2, **kwargs)
+
+
+def key_in_shard(bloom, index, prefix):
+    """first key with prefix routed to shard index"""
+    return next(key for key in ("%s-%d" % (prefix, number)
+                                for number in range(1000))
+                if bloom.shard_of(key) == index)
+
+
+@pytest.mark.parametrize("workers", [None, 3])
+def test_batches_match_single_items(workers):
+    one, many = sharded(), sharded(workers=workers)
+    set_nos = [number % 3 for number in range(len(KEYS))]
+    for key, set_no in zip(KEYS, set_nos):
+        one.insert(key, set_no)
+    many.insert_many(KEYS, set_nos)
+    assert [shard.filter for shard in one.shards] == [
+        shard.filter for shard in many.shards]
+    probes = KEYS + ["other-%d" % number for number in range(100)]
+    assert many.check_many(probes) == [one.check(item) for item in probes]
+    assert many.count == len(KEYS)
+
+
+def test_shards_get_identical_arguments():
+    counting = sharded(shard_class=CountingShiftingBloomFilter,
+                       counter_width=8)
+    assert [shard.filter.width for shard in counting.shards] == [8] * 4
+    concurrent = sharded(shard_class=ConcurrentShiftingBloomFilter,
+                         stripes=8)
+    assert [shard.stripes for shard in concurrent.shards] == [8] * 4
+    sized = ShardedShiftingBloomFilter.for_capacity(
+        1000, 0.01, shard_count=3, hash_source="sha256")
+    assert all(shard.hashfunc == sized.shards[0].hashfunc
+               for shard in sized.shards)
+
+
+def test_prefix_routing():
+    bloom = sharded(prefix_bytes=3)
+    assert len({bloom.shard_of("abc-%d" % number)
+                for number in range(50)}) == 1
+
+
+@pytest.mark.parametrize("mapped", [False, True])
+def test_save_and_load(mapped, tmp_path):
+    bloom = sharded()
+    bloom.insert_many(KEYS)
+    assert bloom.save(str(tmp_path)) == [0, 1, 2, 3]
+    with ShardedShiftingBloomFilter.load(str(tmp_path),
+                                         mapped=mapped) as loaded:
+        assert loaded.check_many(KEYS) == bloom.check_many(KEYS)
+        assert loaded.count == bloom.count
+    key = key_in_shard(bloom, 2, "late")
+    bloom.insert(key)
+    assert bloom.save(str(tmp_path)) == [2]
+
+
+def test_refresh_reloads_shards_of_every_writer(tmp_path):
+    directory = str(tmp_path)
+    sharded().save(directory)
+    first = ShardedShiftingBloomFilter.load(directory)
+    second = ShardedShiftingBloomFilter.load(directory)
+    reader = ShardedShiftingBloomFilter.load(directory)
+    first_key = key_in_shard(first, 1, "first")
+    second_key = key_in_shard(first, 1, "second")
+    first.insert(first_key)
+    first.save(directory)
+    assert reader.refresh() == [1]
+    assert reader.check(first_key)[0]
+    second.insert(second_key)
+    second.save(directory)
+    assert reader.refresh() == [1]
+    assert reader.check(second_key)[0]
+    assert reader.refresh() == []
+
+
+def test_invalid_manifest(tmp_path):
+    (tmp_path / "manifest.json").write_text('{"version": 1}')
+    with pytest.raises(FileFormatError):
+        ShardedShiftingBloomFilter.load(str(tmp_path))
@@ -0,0 +1,345 @@
+"""Tests of ShiftingBloomFilter against the original per-probe hashing."""
+
+import hashlib
+from hashlib import algorithms_guaranteed
+import pickle
+from sys import byteorder
+
+import pytest
+
+from ShiftingBloomFilter import (ShiftingBloomFilter, MULTIPLE, MULTISET,
+                                 FAST_HASH)
+from ShiftingBloomFilter.shifting_bloom_filter import (encode_key, INT_TAG,
+                                                       CACHE_LINE_BITS,
+                                                       PROBE_WIDTH,
+                                                       MAX_HASH_COUNT,
+                                                       _min_length)
+from ShiftingBloomFilter.bit_array import BitArray
+from ShiftingBloomFilter.utils import HashFactory
+from ShiftingBloomFilter.exceptions import IncompatibleFiltersError
+
+KEYS = ["key-%d" % number for number in range(300)]
+OTHERS = ["other-%d" % number for number in range(300)]
+HASHES = [getattr(hashlib, name) for name in sorted(algorithms_guaranteed)
+          if "shake" not in name]
+
+
+def baseline_position(hash_fn, item, offset, m):
+    """position computed by the original implementation of _get_hash"""
+    digest = hash_fn(item.encode()).digest()
+    return (int.from_bytes(digest, byteorder) + offset) % m
+
+
+class BaselineFilter:
+    """original byte per bit filter, probing every offset one by one"""
+
+    def __init__(self, m, hashes, mode, set_count=0):
+        self.m = m
+        self.hashes = hashes
+        self.cut_off = len(hashes) // 2
+        self.mode = mode
+        self.max_set = set_count
+        self.bits = bytearray(m)
+
+    def _insert_at_offset(self, item, offset):
+        self.max_set = max(self.max_set, offset)
+        for hash_fn in self.hashes[:self.cut_off]:
+            self.bits[baseline_position(hash_fn, item, 0, self.m)] = 1
+        for hash_fn in self.hashes[self.cut_off:]:
+            self.bits[baseline_position(hash_fn, item, offset, self.m)] = 1
+
+    def insert(self, item, set_no=0):
+        if self.mode:
+            self._insert_at_offset(item, set_no)
+            return
+        found, count = self.check(item)
+        self._insert_at_offset(item, count + 1 if found else 0)
+
+    def check(self, item):
+        for hash_fn in self.hashes[:self.cut_off]:
+            if not self.bits[baseline_position(hash_fn, item, 0, self.m)]:
+                return (False, []) if self.mode else (False, 0)
+        sets = [set_no for set_no in range(self.max_set + 1)
+                if all(self.bits[baseline_position(hash_fn, item, set_no,
+                                                   self.m)]
+                       for hash_fn in self.hashes[self.cut_off:])]
+        if self.mode:
+            return (len(sets) > 0, sets)
+        return (len(sets) > 0, len(sets))
+
+
+def per_offset_matches(bloom, item):
+    """offsets matched by probing every shifted position one by one"""
+    data = encode_key(item)
+    values = bloom._hash_values(data, bloom._offset_digesters)
+    return [offset for offset in range(bloom.max_set + 1)
+            if all(bloom.filter.test(bloom._shift(value, offset))
+                   for value in values)]
+
+
+@pytest.mark.parametrize("mode", [MULTIPLE, MULTISET])
+def test_positions_match_baseline(mode):
+    bloom = ShiftingBloomFilter(11, hash_source=HASHES, mode=mode,
+                                set_count=3)
+    baseline = BaselineFilter(bloom.m, HASHES, mode, set_count=3)
+    for number, key in enumerate(KEYS[:120]):
+        for _ in range(1 if mode else number % 3 + 1):
+            bloom.insert(key, number % 4)
+            baseline.insert(key, number % 4)
+    assert [bloom[index] for index in range(bloom.m)] == list(baseline.bits)
+    assert bloom.max_set == baseline.max_set
+    for key in KEYS[:120] + OTHERS[:120]:
+        assert bloom.check(key) == baseline.check(key)
+
+
+def counted_hashes(calls, count):
+    """hash functions appending themselves to calls when used"""
+    def counted(hash_fn):
+        def digest(data):
+            calls.append(hash_fn)
+            return hash_fn(data)
+        return digest
+    return [counted(hash_fn) for hash_fn in HASHES[:count]]
+
+
+def test_each_hash_function_digests_a_key_once():
+    calls = []
+    bloom = ShiftingBloomFilter(10, hash_source=counted_hashes(calls, 6),
+                                set_count=20)
+    bloom.insert("apple", 20)
+    assert len(calls) == 6
+    del calls[:]
+    assert bloom.check("apple") == (True, [20])
+    assert len(calls) == 6
+
+
+def test_byte_per_bit_pickles_are_upgraded():
+    bloom = ShiftingBloomFilter(10, hash_source=HASHES, set_count=2)
+    bloom.insert("apple", 2)
+    assert len(bloom.filter.data) == bloom.m // 8
+    state = {"m": bloom.m, "hashfunc": HASHES, "k": len(HASHES),
+             "cut_off": len(HASHES) // 2, "max_set": 2,
+             "filter": bytearray(bloom[index] for index in range(bloom.m)),
+             "length_as_power": True, "hash_source": HASHES,
+             "mode": MULTIPLE, "count": 1}
+    old = ShiftingBloomFilter.__new__(ShiftingBloomFilter)
+    old.__setstate__(state)
+    assert old.filter == bloom.filter
+    assert old.check("apple") == (True, [2])
+
+
+@pytest.mark.parametrize("block_bits", [None, CACHE_LINE_BITS])
+@pytest.mark.parametrize("mode", [MULTIPLE, MULTISET])
+def test_check_many_equals_check(mode, block_bits, backend):
+    bloom = ShiftingBloomFilter(1 << 12, hash_source=HASHES, hash_count=6,
+                                length_as_power=False, mode=mode,
+                                set_count=5, block_bits=block_bits)
+    for number, key in enumerate(KEYS):
+        bloom.insert(key, number % 6)
+    items = KEYS + OTHERS
+    assert bloom.check_many(items) == [bloom.check(item) for item in items]
+
+
+@pytest.mark.parametrize("block_bits", [None, 64])
+def test_insert_many_equals_insert(block_bits, backend):
+    one = ShiftingBloomFilter(1 << 12, hash_source=HASHES, hash_count=4,
+                              length_as_power=False, block_bits=block_bits)
+    many = ShiftingBloomFilter(1 << 12, hash_source=HASHES, hash_count=4,
+                               length_as_power=False, block_bits=block_bits)
+    set_nos = [number % 5 for number in range(len(KEYS))]
+    for key, set_no in zip(KEYS, set_nos):
+        one.insert(key, set_no)
+    many.insert_many(KEYS, set_nos)
+    assert one.filter == many.filter
+    assert (one.count, one.max_set, one.bit_count) == (
+        many.count, many.max_set, many.bit_count)
+
+
+@pytest.mark.parametrize("hash_source", [FAST_HASH, "sha256"])
+def test_for_capacity_keeps_target_fpr(hash_source):
+    bloom = ShiftingBloomFilter.for_capacity(1000, 0.01, set_count=3,
+                                             hash_source=hash_source)
+    for number in range(1000):
+        bloom.insert("item-%d" % number, number % 4)
+    assert bloom.get_fpr() <= 0.01
+    false = sum(bloom.check("missing-%d" % number)[0]
+                for number in range(2000))
+    assert false / 2000 < 0.03
+
+
+@pytest.mark.parametrize("block_bits", [None, 64])
+@pytest.mark.parametrize("set_count", [0, 7, 8, 70, 200])
+def test_window_probing_equals_per_offset_probing(set_count, block_bits):
+    # 70 and 200 sets make windows wrap around the end of blocks and the
+    # filter, and span several bytes
+    bloom = ShiftingBloomFilter(256, hash_source=FAST_HASH, hash_count=4,
+                                length_as_power=False, set_count=set_count,
+                                block_bits=block_bits)
+    for number, key in enumerate(KEYS[:60]):
+        bloom.insert(key, number * 7 % (set_count + 1))
+    for item in KEYS[:60] + OTHERS[:60]:
+        values = bloom._hash_values(encode_key(item), bloom._offset_digesters)
+        expected = per_offset_matches(bloom, item)
+        assert bloom._matching_offsets(values) == expected
+        assert bloom._matching_offsets(values, 2) == expected[:2]
+
+
+def test_narrow_offset_ranges_are_probed_offset_by_offset(monkeypatch):
+    def get_window(*args):
+        raise AssertionError("window read for %d offsets" % (max_set + 1))
+    monkeypatch.setattr(BitArray, "get_window", get_window)
+    for max_set in (0, PROBE_WIDTH - 1):
+        bloom = ShiftingBloomFilter(10, set_count=max_set)
+        bloom.insert("key", max_set)
+        assert bloom.check("key") == (True, [max_set])
+
+
+def test_multiset_insert_digests_a_key_once():
+    calls = []
+    bloom = ShiftingBloomFilter(12, hash_source=counted_hashes(calls, 6),
+                                mode=MULTISET)
+    bloom.insert("apple")
+    del calls[:]
+    bloom.insert("apple")
+    assert len(calls) == 6
+    assert bloom.check("apple") == (True, 2)
+
+
+def test_multiset_counts_and_max_count():
+    bloom = ShiftingBloomFilter(14, hash_source=FAST_HASH, hash_count=4,
+                                mode=MULTISET, max_count=3)
+    for _ in range(5):
+        bloom.insert("apple")
+    bloom.insert("pear")
+    assert bloom.check("apple") == (True, 3)
+    assert bloom.check("pear") == (True, 1)
+    assert bloom.check("plum") == (False, 0)
+    assert bloom.count == 4
+
+
+def test_encode_key():
+    assert encode_key("a") == b"a"
+    assert encode_key(b"a") == b"a"
+    assert encode_key(0) == INT_TAG + b"\x00"
+    assert encode_key(-1) == INT_TAG + b"\xff"
+    assert encode_key(128) == INT_TAG + b"\x80\x00"
+    assert bytes(encode_key(memoryview(b"abc"))) == b"abc"
+    with pytest.raises(TypeError):
+        encode_key(1.5)
+
+
+@pytest.mark.parametrize("hash_source", [FAST_HASH, "sha256"])
+def test_keys_with_equal_bytes_are_the_same_key(hash_source):
+    bloom = ShiftingBloomFilter.for_capacity(100, 0.001,
+                                             hash_source=hash_source)
+    bloom.insert(b"bytes")
+    for key in ("bytes", bytearray(b"bytes"), memoryview(b"bytes")):
+        assert bloom.check(key) == (True, [0])
+    bloom.insert(1234567)
+    assert bloom.check_many([1234567, b"bytes", 7]) == [
+        (True, [0]), (True, [0]), (False, [])]
+
+
+def test_int_keys_do_not_collide_with_str_keys():
+    bloom = ShiftingBloomFilter(16, hash_source=FAST_HASH, hash_count=4)
+    bloom.insert(97)
+    bloom.insert(0x6f6f66)
+    assert bloom.check(97) == (True, [0])
+    assert bloom.check("a") == (False, [])
+    assert bloom.check("foo") == (False, [])
+
+
+def test_bit_count_tracks_set_bits():
+    bloom = ShiftingBloomFilter(12, hash_source=FAST_HASH, hash_count=4,
+                                set_count=3)
+    assert not bloom
+    for number, key in enumerate(KEYS):
+        bloom.insert(key, number % 4)
+    assert bloom.bit_count == bloom.filter.popcount()
+    assert bloom
+    assert bloom.fill_ratio() == bloom.bit_count / bloom.m
+    assert 0 < bloom.get_fpr(from_fill=True) < 1
+
+
+def test_merge_and_intersect():
+    def build(keys):
+        bloom = ShiftingBloomFilter(12, hash_source=FAST_HASH, hash_count=4,
+                                    set_count=1)
+        for key in keys:
+            bloom.insert(key, 1)
+        return bloom
+
+    left, right = build(KEYS[:100]), build(KEYS[50:150])
+    union = left | right
+    assert all(1 in union.check(key)[1] for key in KEYS[:150])
+    assert union.count == 200
+    assert union.bit_count == union.filter.popcount()
+    both = left & right
+    assert all(1 in both.check(key)[1] for key in KEYS[50:100])
+    assert both.count == 100
+    assert both.bit_count == both.filter.popcount()
+    left |= right
+    assert left.filter == union.filter
+    with pytest.raises(IncompatibleFiltersError):
+        left.merge(ShiftingBloomFilter(13, hash_source=FAST_HASH,
+                                       hash_count=4))
+    with pytest.raises(IncompatibleFiltersError):
+        left.merge(ShiftingBloomFilter(12, hash_source=HASHES[:4]))
+
+
+def test_merge_with_restored_salted_filter():
+    bloom = ShiftingBloomFilter(10, hash_source=HashFactory("sha256", 4))
+    bloom.insert("apple")
+    copy = pickle.loads(pickle.dumps(bloom))
+    copy.insert("pear")
+    bloom |= copy
+    assert bloom.check("pear") == (True, [0])
+
+
+def test_blocked_positions_stay_in_one_block():
+    bloom = ShiftingBloomFilter(1 << 12, hash_source=FAST_HASH, hash_count=8,
+                                length_as_power=False, set_count=5,
+                                block_bits=CACHE_LINE_BITS)
+    bloom.insert("key", 5)
+    blocks = {index // CACHE_LINE_BITS for index in range(bloom.m)
+              if bloom[index]}
+    assert len(blocks) == 1
+    with pytest.raises(ValueError):
+        ShiftingBloomFilter(1000, length_as_power=False, block_bits=512)
+
+
+@pytest.mark.parametrize("mode", [MULTIPLE, MULTISET])
+def test_block_of_a_key_is_hashed_once(mode):
+    bloom = ShiftingBloomFilter(1 << 12, hash_source=FAST_HASH, hash_count=4,
+                                length_as_power=False, mode=mode,
+                                set_count=3, block_bits=CACHE_LINE_BITS)
+    calls = []
+    block_of = bloom._block_of
+    bloom._block_of = lambda data: calls.append(data) or block_of(data)
+    bloom.insert("apple", 3)
+    assert len(calls) == 1
+    assert bloom.check("apple")[0]
+    assert len(calls) == 2
+
+
+def test_blocked_for_capacity_keeps_target_fpr():
+    bloom = ShiftingBloomFilter.for_capacity(1000, 0.01, set_count=3,
+                                             block_bits=CACHE_LINE_BITS)
+    assert bloom.block_bits == CACHE_LINE_BITS
+    for number in range(1000):
+        bloom.insert("item-%d" % number, number % 4)
+    assert bloom.get_fpr() <= 0.01
+    false = sum(bloom.check("missing-%d" % number)[0]
+                for number in range(2000))
+    assert false / 2000 < 0.03
+
+
+@pytest.mark.parametrize("n, target_fpr", [(10, 0.1), (10 ** 4, 1e-4)])
+def test_blocked_for_capacity_picks_smallest_length(n, target_fpr):
+    bloom = ShiftingBloomFilter.for_capacity(n, target_fpr,
+                                             block_bits=CACHE_LINE_BITS)
+    smallest = min(
+        (_min_length(n, target_fpr, k, 0, CACHE_LINE_BITS), k)
+        for k in range(1, MAX_HASH_COUNT + 1)
+    )
+    assert (bloom.m, bloom.k) == smallest
@@ -0,0 +1,60 @@
+"""Tests of hash factories and data set readers."""
+
+import gzip
+import hashlib
+
+from ShiftingBloomFilter import ShiftingBloomFilter, FAST_HASH
+from ShiftingBloomFilter.utils import (HashFactory, HashFunction,
+                                       PrefixHashFunction, ChunkedDataSet,
+                                       CSVDataSet)
+from ShiftingBloomFilter.shifting_bloom_filter import int_digester
+
+
+def test_salted_functions_digest_like_their_description():
+    factory = HashFactory("sha256", 3)
+    for function in factory:
+        assert isinstance(function, HashFunction)
+        expected = function.hash_base(b"key" + function.salt).digest()
+        assert function(b"key").digest() == expected
+    prefix = HashFactory("sha256", 3, prefix=True)
+    for function in prefix:
+        assert isinstance(function, PrefixHashFunction)
+        expected = hashlib.sha256(function.salt + b"key").digest()
+        assert function(b"key").digest() == expected
+        assert function(memoryview(b"key")).digest() == expected
+    blake = HashFactory("blake2b", 3, prefix=True)
+    for function in blake:
+        assert int_digester(function)(b"key") == function.intdigest(b"key")
+
+
+def test_hash_all_encodes_once():
+    factory = HashFactory(FAST_HASH, 4)
+    assert factory.hash_all("key") == [function(b"key").digest()
+                                       for function in factory]
+
+
+def test_chunked_data_set_loads_in_batches(tmp_path):
+    path = tmp_path / "keys.csv.gz"
+    rows = ["key,set"] + ["key-%d,%d" % (number, number % 3)
+                          for number in range(250)]
+    with gzip.open(path, "wt") as datafile:
+        datafile.write("\n".join(rows))
+    expected = ShiftingBloomFilter(12, hash_source=FAST_HASH, hash_count=4)
+    expected.insert_many(["key-%d" % number for number in range(250)],
+                         [number % 3 for number in range(250)])
+    bloom = ShiftingBloomFilter(12, hash_source=FAST_HASH, hash_count=4)
+    progress = []
+    with ChunkedDataSet(str(path), set_column=1, header=True, batch_size=100,
+                        chunk_size=64) as data:
+        inserted = data.load_into(bloom,
+                                  lambda *args: progress.append(args))
+    assert inserted == 250
+    assert [inserted for inserted, _ in progress] == [100, 200, 250]
+    assert bloom.filter == expected.filter
+
+
+def test_csv_data_set(tmp_path):
+    path = tmp_path / "rows.csv"
+    path.write_text("a,1\n\nb\nc,2\n")
+    with CSVDataSet(str(path)) as data:
+        assert list(data) == [["a", "1"], ["b"], ["c", "2"]]